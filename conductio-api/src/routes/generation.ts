@@ -7,6 +7,19 @@ import { ConductioService } from '../services/conductioEngine';
 
 const router = Router();
 
+const AUDIO_FORMATS = ['wav', 'flac', 'ogg', 'opus'];
+
+const AUDIO_MIME_TYPES: Record<string, string> = {
+  '.wav': 'audio/wav',
+  '.flac': 'audio/flac',
+  '.ogg': 'audio/ogg',
+  '.opus': 'audio/ogg'
+};
+
+function audioMimeType(filePath: string): string {
+  return AUDIO_MIME_TYPES[path.extname(filePath)] || 'application/octet-stream';
+}
+
 // Store generation jobs in memory (in production, use a database)
 const generationJobs = new Map<string, {
   id: string;
@@ -34,8 +47,20 @@ router.post('/', async (req: Request, res: Response) => {
       } as ApiResponse);
     }
     
+    if (request.audioFormat && !AUDIO_FORMATS.includes(request.audioFormat)) {
+      return res.status(400).json({
+        success: false,
+        error: 'Invalid audio format',
+        message: `Audio format must be one of: ${AUDIO_FORMATS.join(', ')}`
+      } as ApiResponse);
+    }
+    
     console.log(`🎵 Starting ${request.layer} generation...`);
     
+    if (request.streamAudio && request.renderAudio !== false) {
+      return streamGeneration(request, res);
+    }
+    
     // Generate music synchronously
     const result = await ConductioService.generateLayer(request);
     
@@ -58,12 +83,12 @@ router.post('/', async (req: Request, res: Response) => {
     
     if (renderAudio) {
       // Try to send audio file first
-      const audioFile = path.join(outputDir, `${layer}.wav`);
+      const audioFile = result.audioFile || path.join(outputDir, `${layer}.wav`);
       try {
         await fs.access(audioFile);
         filePath = audioFile;
-        mimeType = 'audio/wav';
-        fileExtension = 'wav';
+        mimeType = audioMimeType(audioFile);
+        fileExtension = path.extname(audioFile).slice(1);
         console.log(`🎶 Streaming audio file: ${audioFile}`);
       } catch {
         // Fallback to MIDI if audio not found
@@ -116,6 +141,53 @@ router.post('/', async (req: Request, res: Response) => {
   }
 });
 
+/**
+ * Progressive variant of POST /generate: audio is forwarded with chunked
+ * transfer encoding as the engine renders it, so playback can start before the
+ * render and file write finish. The stream plays at the synth's own level and is
+ * always WAV; the packaged file (in `audioFormat`) is normalized.
+ */
+async function streamGeneration(request: GenerationRequest, res: Response) {
+  let streaming = false;
+  const result = await ConductioService.generateLayer(request, (chunk) => {
+    if (!streaming) {
+      streaming = true;
+      res.status(200);
+      res.setHeader('Content-Type', 'audio/wav');
+      res.setHeader('Cache-Control', 'no-cache');
+      res.setHeader('X-Generation-Info', JSON.stringify({
+        layer: request.layer,
+        genre: request.genre || 'general',
+        key: request.key || 'C minor',
+        bpm: request.bpm || 120,
+        bars: request.bars || 8,
+        instrument: request.instrument || 'auto',
+        fileType: 'wav',
+        streamed: true
+      }));
+      res.flushHeaders();
+      console.log(`🎶 Streaming ${request.layer} audio as it renders`);
+    }
+    res.write(chunk);
+  });
+  
+  if (streaming) {
+    // Headers are already out, so a failure can only be signalled by cutting the stream short
+    if (result.success) {
+      res.end();
+    } else {
+      res.destroy(new Error(result.error || 'Generation failed'));
+    }
+    return;
+  }
+  
+  return res.status(500).json({
+    success: false,
+    error: 'Generation failed',
+    message: result.error || 'No audio was rendered'
+  } as ApiResponse);
+}
+
 // Async generation endpoint (for longer generations)
 router.post('/async', async (req: Request, res: Response) => {
   try {
@@ -130,6 +202,14 @@ router.post('/async', async (req: Request, res: Response) => {
       } as ApiResponse);
     }
     
+    if (request.audioFormat && !AUDIO_FORMATS.includes(request.audioFormat)) {
+      return res.status(400).json({
+        success: false,
+        error: 'Invalid audio format',
+        message: `Audio format must be one of: ${AUDIO_FORMATS.join(', ')}`
+      } as ApiResponse);
+    }
+    
     // Generate unique job ID
     const jobId = uuidv4();
     
@@ -221,7 +301,7 @@ router.get('/download/:id/:type', async (req: Request, res: Response) => {
       mimeType = 'audio/midi';
     } else if (type === 'audio' && job.result.audioFile) {
       filePath = job.result.audioFile;
-      mimeType = 'audio/wav';
+      mimeType = audioMimeType(filePath);
     } else {
       return res.status(400).json({
         success: false,
@@ -263,7 +343,7 @@ async function generateLayerAsync(jobId: string, request: GenerationRequest) {
       const layer = request.layer;
       
       const midiFile = path.join(outputDir, `${layer}.mid`);
-      const audioFile = path.join(outputDir, `${layer}.wav`);
+      const audioFile = result.audioFile || path.join(outputDir, `${layer}.wav`);
       
       // Check which files exist
       const midiExists = await fs.access(midiFile).then(() => true).catch(() => false);
@@ -4,11 +4,25 @@ import { ConductioService } from '../services/conductioEngine';
 
 const router = Router();
 
+// Instrument listings only change when the engine's catalog does, so clients can revalidate with If-None-Match
+function notModified(req: Request, res: Response, etag?: string): boolean {
+  if (!etag) return false;
+  res.setHeader('ETag', etag);
+  res.setHeader('Cache-Control', 'no-cache');
+  if (req.headers['if-none-match'] === etag) {
+    res.status(304).end();
+    return true;
+  }
+  return false;
+}
+
 router.get('/', async (req: Request, res: Response) => {
   try {
     const result = await ConductioService.listInstruments();
     
     if (result.success && result.instruments) {
+      if (notModified(req, res, result.etag)) return;
+      
       const response: ApiResponse<Instrument[]> = {
         success: true,
         data: result.instruments
@@ -37,6 +51,8 @@ router.get('/categories', async (req: Request, res: Response) => {
     const result = await ConductioService.listInstruments();
     
     if (result.success && result.instruments) {
+      if (notModified(req, res, result.etag)) return;
+      
       // Group instruments by category
       const categoriesMap = new Map<string, Instrument[]>();
       
@@ -2,35 +2,37 @@ import { exec } from 'child_process';
 import { promisify } from 'util';
 import path from 'path';
 import fs from 'fs/promises';
-import { GenerationRequest } from '../types';
+import crypto from 'crypto';
+import { GenerationRequest, Instrument } from '../types';
+import { EngineWorkerPool } from './engineWorker';
 
 const execAsync = promisify(exec);
 
 export class ConductioEngine {
   private static readonly CONDUCTIO_ENGINE_PATH = path.join(process.cwd(), '..', 'conductio-engine');
   private static readonly PYTHON_CMD = './venv/bin/python';
+  private static readonly INSTRUMENTS_SOURCE = path.join(ConductioEngine.CONDUCTIO_ENGINE_PATH, 'generation', 'instruments.py');
+  // Same setting the engine reads; relative paths are relative to the engine directory, as they are for the engine
+  private static readonly INSTRUMENT_CATALOG = path.resolve(
+    ConductioEngine.CONDUCTIO_ENGINE_PATH,
+    process.env.CONDUCTIO_INSTRUMENT_CATALOG || path.join('.cache', 'instrument_catalog.json')
+  );
+  private static readonly CATALOG_VERSION = 1;
+  private static catalogCache: { sourceMtimeMs: number; etag: string; instruments: Instrument[] } | null = null;
+  private static readonly workers = new EngineWorkerPool(
+    ConductioEngine.CONDUCTIO_ENGINE_PATH,
+    ConductioEngine.PYTHON_CMD
+  );
   
   private static normalizeInstrumentName(instrument: string): string {
-    // Handle common variations and normalize instrument names
+    // Only tidy the spelling here; aliases and misspellings are resolved by the engine's
+    // instrument index (generation/instruments.py) so both sides share one definition
     if (instrument === 'auto') return instrument;
     
     // Convert to lowercase and replace spaces/hyphens with underscores
-    let normalized = instrument.toLowerCase()
+    return instrument.toLowerCase()
       .replace(/[- ]+/g, '_')
       .replace(/[^a-z0-9_]/g, ''); // Remove special characters
-    
-    // Handle common misspellings/variations
-    const corrections: Record<string, string> = {
-      'honkey_tonk_piano': 'honky_tonk_piano',
-      'honky_tonk': 'honky_tonk_piano',
-      'piano': 'acoustic_grand_piano',
-      'guitar': 'acoustic_guitar_steel',
-      'bass': 'electric_bass_finger',
-      'violin_1': 'violin',
-      'strings': 'violin'
-    };
-    
-    return corrections[normalized] || normalized;
   }
   
   static async checkAvailability(): Promise<boolean> {
@@ -50,9 +52,14 @@ export class ConductioEngine {
     }
   }
   
-  static async generateLayer(request: GenerationRequest): Promise<{
+  /**
+   * Generate a single layer. With `onAudio`, the engine streams the audio as a
+   * progressive WAV while it renders and each chunk is passed on as it arrives.
+   */
+  static async generateLayer(request: GenerationRequest, onAudio?: (chunk: Buffer) => void): Promise<{
     success: boolean;
     outputPath?: string;
+    audioFile?: string;
     error?: string;
   }> {
     try {
@@ -63,51 +70,37 @@ export class ConductioEngine {
         bars = 8,
         instrument = 'auto',
         genre = 'general',
-        renderAudio = true
+        renderAudio = true,
+        audioFormat = 'wav'
       } = request;
       
       // Normalize instrument name
       const normalizedInstrument = this.normalizeInstrumentName(instrument);
       
-      // Build the command
-      const args = [
-        'main.py',
-        '--layer', layer,
-        '--key', `"${key}"`,
-        '--bpm', bpm.toString(),
-        '--bars', bars.toString(),
-        '--instrument', `"${normalizedInstrument}"`,
-        '--genre', `"${genre}"`
-      ];
-      
-      if (!renderAudio) {
-        args.push('--no-audio');
-      }
-      
-      const cmd = `cd "${this.CONDUCTIO_ENGINE_PATH}" && ${this.PYTHON_CMD} ${args.join(' ')}`;
-      console.log('Executing:', cmd);
-      
-      const { stdout, stderr } = await execAsync(cmd, {
-        timeout: 240000, // 4 minute timeout (AI + audio rendering can take time)
-        maxBuffer: 1024 * 1024 // 1MB buffer
-      });
-      
-      console.log('Conductio output:', stdout);
-      if (stderr) {
-        console.error('Conductio stderr:', stderr);
-      }
-      
-      // Parse output to find the generated folder
-      const outputMatch = stdout.match(/✅ Saved \w+ MIDI to (output\/[^\/]+\.mcpkg)/);
-      if (!outputMatch) {
-        throw new Error('Could not parse output path from Conductio response');
+      // Hand the job to the next free warm engine worker
+      const result = await this.workers.request({
+        layer,
+        key,
+        bpm,
+        bars,
+        instrument: normalizedInstrument,
+        genre,
+        renderAudio,
+        audioFormat,
+        streamAudio: Boolean(onAudio && renderAudio)
+      }, 240000, onAudio && ((message) => onAudio(Buffer.from(message.data, 'base64')))); // 4 minute timeout (AI + audio rendering can take time)
+      
+      if (!result.success || !result.outputPath) {
+        throw new Error(result.error || 'Conductio engine job failed');
       }
       
-      const outputPath = outputMatch[1];
+      const outputPath = result.outputPath;
       
       return {
         success: true,
-        outputPath: path.join(this.CONDUCTIO_ENGINE_PATH, outputPath)
+        outputPath: path.join(this.CONDUCTIO_ENGINE_PATH, outputPath),
+        // The engine reports the encoded file (or the WAV, if encoding failed)
+        audioFile: result.audioFile ? path.join(this.CONDUCTIO_ENGINE_PATH, result.audioFile) : undefined
       };
       
     } catch (error) {
@@ -119,39 +112,72 @@ export class ConductioEngine {
     }
   }
   
+  private static async readCatalog(sourceHash: string): Promise<any | null> {
+    try {
+      const catalog = JSON.parse(await fs.readFile(this.INSTRUMENT_CATALOG, 'utf8'));
+      const current = catalog.version === this.CATALOG_VERSION && catalog.sourceHash === sourceHash;
+      return current ? catalog : null;
+    } catch {
+      return null;
+    }
+  }
+  
+  private static async loadInstrumentCatalog(): Promise<{ etag: string; instruments: Instrument[] }> {
+    // Served from memory until instruments.py changes on disk
+    const { mtimeMs } = await fs.stat(this.INSTRUMENTS_SOURCE);
+    if (this.catalogCache && this.catalogCache.sourceMtimeMs === mtimeMs) {
+      return this.catalogCache;
+    }
+    
+    const source = await fs.readFile(this.INSTRUMENTS_SOURCE);
+    const sourceHash = crypto.createHash('sha256').update(source).digest('hex');
+    let catalog = await this.readCatalog(sourceHash);
+    if (!catalog) {
+      // Missing or stale: have the engine regenerate it once
+      const { stderr } = await execAsync(
+        `cd "${this.CONDUCTIO_ENGINE_PATH}" && ${this.PYTHON_CMD} main.py --export-catalog "${this.INSTRUMENT_CATALOG}"`,
+        { timeout: 10000 }
+      );
+      if (stderr) {
+        console.error('Instrument catalog export stderr:', stderr);
+      }
+      catalog = await this.readCatalog(sourceHash);
+      if (!catalog) {
+        throw new Error('Instrument catalog export did not produce a current catalog');
+      }
+    }
+    
+    const programs = new Map<string, any>(catalog.programs.map((program: any) => [program.name, program]));
+    const instruments: Instrument[] = [];
+    for (const [category, names] of Object.entries(catalog.categories as Record<string, string[]>)) {
+      for (const name of names) {
+        const program = programs.get(name);
+        instruments.push({
+          id: program.id,
+          name,
+          displayName: program.displayName,
+          category
+        });
+      }
+    }
+    
+    this.catalogCache = { sourceMtimeMs: mtimeMs, etag: `"${catalog.contentHash}"`, instruments };
+    return this.catalogCache;
+  }
+  
   static async listInstruments(): Promise<{
     success: boolean;
-    instruments?: any[];
+    instruments?: Instrument[];
+    etag?: string;
     error?: string;
   }> {
     try {
-      const cmd = `cd "${this.CONDUCTIO_ENGINE_PATH}" && ${this.PYTHON_CMD} -c "
-from generation.instruments import list_instruments_by_category
-import json
-categories = list_instruments_by_category()
-result = []
-for category, instruments in categories.items():
-    for name, program in instruments:
-        result.append({
-            'id': program,
-            'name': name,
-            'displayName': name.replace('_', ' ').title(),
-            'category': category
-        })
-print(json.dumps(result))
-"`;
-      
-      const { stdout, stderr } = await execAsync(cmd, { timeout: 10000 });
-      
-      if (stderr) {
-        console.error('Instrument listing stderr:', stderr);
-      }
-      
-      const instruments = JSON.parse(stdout.trim());
+      const { etag, instruments } = await this.loadInstrumentCatalog();
       
       return {
         success: true,
-        instruments
+        instruments,
+        etag
       };
       
     } catch (error) {
@@ -162,4 +188,4 @@ print(json.dumps(result))
       };
     }
   }
-}
\ No newline at end of file
+}
@@ -0,0 +1,212 @@
+import { spawn, ChildProcessWithoutNullStreams } from 'child_process';
+import os from 'os';
+import readline from 'readline';
+import { v4 as uuidv4 } from 'uuid';
+import { EngineJobResult } from '../types';
+
+// Messages sent while a job runs, ahead of its final reply: streamed audio, and "rendered" once
+// only a background encode is left (the worker can take its next job from then on)
+const PROGRESS_EVENTS = new Set(['audio', 'rendered']);
+
+interface PendingJob {
+  resolve: (result: EngineJobResult) => void;
+  reject: (error: Error) => void;
+  timer: NodeJS.Timeout;
+  onEvent?: (message: any) => void;
+  child: ChildProcessWithoutNullStreams;
+}
+
+/**
+ * Long-lived `main.py --serve` process. Jobs are written to its stdin as JSON
+ * lines and matched back to their callers by id, so Python start-up, imports,
+ * the OpenAI client and the loaded soundfont are paid for once per process.
+ */
+export class EngineWorker {
+  private process?: ChildProcessWithoutNullStreams;
+  private ready?: Promise<ChildProcessWithoutNullStreams>;
+  private pending = new Map<string, PendingJob>();
+
+  constructor(
+    private readonly cwd: string,
+    private readonly pythonCmd: string,
+    private readonly startupTimeout = 60000
+  ) {}
+
+  start(): Promise<ChildProcessWithoutNullStreams> {
+    if (this.ready) return this.ready;
+
+    const child = spawn(this.pythonCmd, ['main.py', '--serve'], { cwd: this.cwd });
+    this.process = child;
+    this.ready = new Promise<ChildProcessWithoutNullStreams>((resolve, reject) => {
+      const startupTimer = setTimeout(() => {
+        reject(new Error('Conductio engine worker did not become ready in time'));
+        this.stop(child);
+      }, this.startupTimeout);
+
+      const lines = readline.createInterface({ input: child.stdout });
+      lines.on('line', (line) => {
+        let message: any;
+        try {
+          message = JSON.parse(line);
+        } catch {
+          console.error('Conductio worker sent invalid output:', line);
+          return;
+        }
+
+        if (message.event === 'ready') {
+          clearTimeout(startupTimer);
+          console.log(`🎵 Conductio engine worker ready (pid ${message.pid})`);
+          resolve(child);
+          return;
+        }
+
+        const job = message.id ? this.pending.get(message.id) : undefined;
+        if (!job || job.child !== child) return;
+
+        if (PROGRESS_EVENTS.has(message.event)) {
+          job.onEvent?.(message);
+          return;
+        }
+
+        this.pending.delete(message.id);
+        clearTimeout(job.timer);
+        job.resolve(message as EngineJobResult);
+      });
+
+      child.stderr.on('data', (data: Buffer) => {
+        process.stderr.write(`[conductio-engine] ${data}`);
+      });
+
+      // Writes to a child that has just died fail with EPIPE; its 'exit' handler fails the jobs
+      child.stdin.on('error', () => {});
+
+      // A replaced child can exit after its successor has started, so only its own jobs and state are cleared
+      const exited = (error: Error) => {
+        clearTimeout(startupTimer);
+        reject(error);
+        this.failPending(child, error);
+        if (this.process === child) {
+          this.process = undefined;
+          this.ready = undefined;
+        }
+      };
+      child.on('exit', (code, signal) => {
+        exited(new Error(`Conductio engine worker exited (code ${code}, signal ${signal})`));
+      });
+      child.on('error', exited);
+    });
+
+    return this.ready;
+  }
+
+  async request(
+    payload: Record<string, unknown>,
+    timeout = 240000,
+    onEvent?: (message: any) => void
+  ): Promise<EngineJobResult> {
+    const child = await this.start();
+
+    const id = uuidv4();
+    return new Promise<EngineJobResult>((resolve, reject) => {
+      if (this.process !== child) {
+        reject(new Error('Conductio engine worker stopped before the job was sent'));
+        return;
+      }
+
+      const timer = setTimeout(() => {
+        this.pending.delete(id);
+        reject(new Error(`Conductio engine job ${id} timed out`));
+        // The process is still busy with the abandoned job; replace it rather than queue behind it
+        this.stop(child);
+      }, timeout);
+
+      this.pending.set(id, { resolve, reject, timer, onEvent, child });
+      child.stdin.write(JSON.stringify({ ...payload, id }) + '\n');
+    });
+  }
+
+  /** Kill `child` (the current process by default); a replacement is started by the next request. */
+  stop(child = this.process): void {
+    child?.kill();
+    if (child === this.process) {
+      this.process = undefined;
+      this.ready = undefined;
+    }
+  }
+
+  private failPending(child: ChildProcessWithoutNullStreams, error: Error): void {
+    for (const [id, job] of this.pending) {
+      if (job.child !== child) continue;
+      clearTimeout(job.timer);
+      job.reject(error);
+      this.pending.delete(id);
+    }
+  }
+}
+
+interface QueuedJob {
+  payload: Record<string, unknown>;
+  timeout: number;
+  onEvent?: (message: any) => void;
+  resolve: (result: EngineJobResult) => void;
+  reject: (error: Error) => void;
+}
+
+/**
+ * A fixed number of warm engine workers, each running one job at a time.
+ * Jobs wait in a FIFO queue for a free worker and their timeout only starts
+ * once they are handed to one, so time spent queued under load never counts
+ * against it. A worker is free again once it reports "rendered", so the next
+ * job runs while the previous one's audio is still being encoded. Workers are
+ * started on first use.
+ */
+export class EngineWorkerPool {
+  private readonly workers: EngineWorker[];
+  private readonly idle: EngineWorker[];
+  private queue: QueuedJob[] = [];
+
+  constructor(
+    cwd: string,
+    pythonCmd: string,
+    readonly size = Number(process.env.CONDUCTIO_ENGINE_WORKERS) || os.cpus().length || 1
+  ) {
+    this.workers = Array.from({ length: size }, () => new EngineWorker(cwd, pythonCmd));
+    this.idle = [...this.workers];
+  }
+
+  request(
+    payload: Record<string, unknown>,
+    timeout = 240000,
+    onEvent?: (message: any) => void
+  ): Promise<EngineJobResult> {
+    return new Promise<EngineJobResult>((resolve, reject) => {
+      this.queue.push({ payload, timeout, onEvent, resolve, reject });
+      this.dispatch();
+    });
+  }
+
+  stop(): void {
+    for (const worker of this.workers) worker.stop();
+  }
+
+  private dispatch(): void {
+    while (this.idle.length > 0 && this.queue.length > 0) {
+      const worker = this.idle.shift()!;
+      const job = this.queue.shift()!;
+      let freed = false;
+      const free = () => {
+        if (freed) return;
+        freed = true;
+        this.idle.push(worker);
+        this.dispatch();
+      };
+      const onEvent = (message: any) => {
+        if (message.event === 'rendered') free();
+        else job.onEvent?.(message);
+      };
+      worker.request(job.payload, job.timeout, onEvent)
+        .then(job.resolve, job.reject)
+        .finally(free);
+    }
+  }
+}
@@ -6,8 +6,12 @@ export interface GenerationRequest {
   instrument?: string;
   genre?: string;
   renderAudio?: boolean;
+  streamAudio?: boolean;
+  audioFormat?: AudioFormat;
 }
 
+export type AudioFormat = 'wav' | 'flac' | 'ogg' | 'opus';
+
 export interface GenerationResponse {
   success: boolean;
   data?: {
@@ -27,6 +31,17 @@ export interface GenerationResponse {
   message?: string;
 }
 
+export interface EngineJobResult {
+  id: string;
+  success: boolean;
+  outputPath?: string;
+  patternFile?: string;
+  midiFile?: string;
+  audioFile?: string | null;
+  elapsed?: number;
+  error?: string;
+}
+
 export interface Instrument {
   id: number;
   name: string;
@@ -10,21 +10,10 @@ console.log('============================================');
 function normalizeInstrumentName(instrument) {
   if (instrument === 'auto') return instrument;
   
-  let normalized = instrument.toLowerCase()
+  // Aliases and misspellings (e.g. "honkey_tonk_piano") are resolved by the engine's instrument index
+  return instrument.toLowerCase()
     .replace(/[- ]+/g, '_')
     .replace(/[^a-z0-9_]/g, '');
-  
-  const corrections = {
-    'honkey_tonk_piano': 'honky_tonk_piano',
-    'honky_tonk': 'honky_tonk_piano',
-    'piano': 'acoustic_grand_piano',
-    'guitar': 'acoustic_guitar_steel',
-    'bass': 'electric_bass_finger',
-    'violin_1': 'violin',
-    'strings': 'violin'
-  };
-  
-  return corrections[normalized] || normalized;
 }
 
 // Test cases
@@ -0,0 +1,147 @@
+import hashlib
+import json
+import os
+import random
+import tempfile
+import time
+from pathlib import Path
+from typing import Optional
+
+def temp_path(path: Path) -> Path:
+    """A fresh, uniquely named temporary file next to `path`, to be moved into place with os.replace."""
+    fd, name = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    os.close(fd)
+    return Path(name)
+
+def cache_settings(prefix: str, directory: str, max_mb: float) -> dict:
+    """Directory, size limit and on/off switch read from PREFIX_DIR, PREFIX_MAX_MB and PREFIX."""
+    return {
+        "directory": os.getenv(f"{prefix}_DIR", directory),
+        "max_bytes": int(float(os.getenv(f"{prefix}_MAX_MB", str(max_mb))) * 1024 * 1024),
+        "enabled": os.getenv(prefix, "1") not in ("0", "false", "no"),
+    }
+
+class DiskCache:
+    """Directory of cache entry files named by key, sharded by the key's first two characters.
+
+    Once the entries add up to more than `max_bytes` the least recently used are evicted.
+    Subclasses set the entry `suffix` and may change how an entry is marked as used.
+    """
+
+    suffix = ".json"
+
+    def __init__(self, directory: str, max_bytes: int, enabled: bool = True):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.enabled = enabled
+
+    def _path(self, key: str) -> Path:
+        return self.directory / key[:2] / f"{key}{self.suffix}"
+
+    def _touch(self, path: Path):
+        # Mark the entry as recently used for eviction
+        os.utime(path)
+
+    @staticmethod
+    def _last_used(stat: os.stat_result) -> float:
+        return stat.st_mtime
+
+    def _evict(self):
+        entries = []
+        total = 0
+        for path in self.directory.glob(f"*/*{self.suffix}"):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            entries.append((self._last_used(stat), stat.st_size, path))
+            total += stat.st_size
+
+        if total <= self.max_bytes:
+            return
+
+        # Oldest (least recently used) first
+        for _, size, path in sorted(entries, key=lambda entry: entry[0]):
+            path.unlink(missing_ok=True)
+            total -= size
+            if total <= self.max_bytes:
+                break
+
+    def clear(self):
+        """Remove every cache entry."""
+        for path in self.directory.glob(f"*/*{self.suffix}"):
+            path.unlink(missing_ok=True)
+
+class ResponseCache(DiskCache):
+    """Persistent, content-addressed cache of model responses.
+
+    Entries are JSON files named by a hash of (model, prompt, response_format, variant).
+    They expire after `ttl` seconds, and once the cache grows past `max_bytes` the least
+    recently used entries are evicted. With `variants` > 1 each prompt keeps up to that
+    many distinct responses and lookups pick one at random, so repeat requests still vary.
+    """
+
+    def __init__(self, directory: str = ".cache/llm", ttl: float = 7 * 24 * 3600, max_bytes: int = 100 * 1024 * 1024,
+                 variants: int = 1, enabled: bool = True):
+        super().__init__(directory, max_bytes, enabled)
+        self.ttl = ttl
+        self.variants = max(1, variants)
+
+    @staticmethod
+    def make_key(model: str, prompt, response_format: Optional[dict], variant: int = 0) -> str:
+        """Hash the request into a stable cache key."""
+        payload = json.dumps([model, prompt, response_format, variant], sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def pick_variant(self) -> int:
+        return random.randrange(self.variants)
+
+    def get(self, key: str) -> Optional[dict]:
+        """Return the cached response for `key`, or None on a miss or expired entry."""
+        if not self.enabled:
+            return None
+        path = self._path(key)
+        try:
+            with open(path, "r") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        if time.time() - entry.get("created", 0) > self.ttl:
+            path.unlink(missing_ok=True)
+            return None
+
+        self._touch(path)
+        return entry.get("response")
+
+    def put(self, key: str, response: dict):
+        """Store a response and evict old entries if the cache is over its size limit."""
+        if not self.enabled:
+            return
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+
+        # Write to a temporary file first so readers never see a partial entry
+        tmp_path = temp_path(path)
+        with open(tmp_path, "w") as f:
+            json.dump({"created": time.time(), "response": response}, f)
+        os.replace(tmp_path, path)
+
+        self._evict()
+
+    def discard(self, key: str):
+        """Remove the entry for `key`, if there is one."""
+        self._path(key).unlink(missing_ok=True)
+
+_response_cache: Optional[ResponseCache] = None
+
+def get_response_cache() -> ResponseCache:
+    """Return the process-wide response cache, configured from CONDUCTIO_LLM_CACHE_* environment variables."""
+    global _response_cache
+    if _response_cache is None:
+        _response_cache = ResponseCache(
+            ttl=float(os.getenv("CONDUCTIO_LLM_CACHE_TTL", str(7 * 24 * 3600))),
+            variants=int(os.getenv("CONDUCTIO_LLM_CACHE_VARIANTS", "1")),
+            **cache_settings("CONDUCTIO_LLM_CACHE", ".cache/llm", 100),
+        )
+    return _response_cache
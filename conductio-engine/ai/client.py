@@ -1,41 +1,296 @@
-import os, json
-from openai import OpenAI
+import os, json, asyncio
+from typing import TYPE_CHECKING, Iterator, List, Optional, Union
 from dotenv import load_dotenv
+from ai.cache import ResponseCache, get_response_cache
+from ai.retry import acall_with_retries, call_with_retries
+from ai.pattern_parser import CompactPatternParser, PatternStreamParser, parse_pattern_text, validate_pattern
+
+# The OpenAI SDK is slow to import, so it's only loaded once a request actually goes to the network
+if TYPE_CHECKING:
+    from openai import OpenAI, AsyncOpenAI, Timeout
 
 # Load environment variables from .env file
 load_dotenv()
 
-def generate_pattern(prompt: str, model="gpt-5-mini", layer: str = "melody", key: str = "C minor", bpm: int = 120, bars: int = 8) -> dict:
-    """Generate a pattern using OpenAI API or return a mock pattern for testing."""
+# Connection settings for the pooled client; retries are handled by ai.retry, not the SDK
+CONNECT_TIMEOUT = float(os.getenv("CONDUCTIO_OPENAI_CONNECT_TIMEOUT", "5"))
+READ_TIMEOUT = float(os.getenv("CONDUCTIO_OPENAI_READ_TIMEOUT", "90"))
+MAX_CONNECTIONS = int(os.getenv("CONDUCTIO_OPENAI_MAX_CONNECTIONS", "16"))
+
+def _timeout() -> "Timeout":
+    from openai import Timeout
+    return Timeout(READ_TIMEOUT, connect=CONNECT_TIMEOUT)
+
+# JSON patterns use JSON mode; compact patterns are plain text rows (see ai.pattern_parser)
+RESPONSE_FORMATS = {
+    "json": {"type": "json_object"},
+    "compact": {"type": "text"},
+}
+
+# OpenAI client kept resident for the lifetime of the process (see get_client)
+_client = None
+_client_key = None
+
+def get_client(api_key: str) -> "OpenAI":
+    """Return a process-wide OpenAI client, creating it on first use.
+    
+    The client keeps its HTTP connections alive between requests and uses the configured
+    connect/read timeouts.
+    """
+    global _client, _client_key
+    if _client is None or _client_key != api_key:
+        # httpx comes with openai, but is imported directly for the connection limits
+        import httpx
+        from openai import OpenAI, DefaultHttpxClient
+        _client = OpenAI(
+            api_key=api_key,
+            timeout=_timeout(),
+            max_retries=0,
+            http_client=DefaultHttpxClient(
+                limits=httpx.Limits(max_connections=MAX_CONNECTIONS, max_keepalive_connections=MAX_CONNECTIONS),
+            ),
+        )
+        _client_key = api_key
+    return _client
+
+def _messages(prompt: Union[str, List[dict]]) -> List[dict]:
+    """Chat messages for a prompt given either as plain text or as messages from build_messages."""
+    return [{"role": "user", "content": prompt}] if isinstance(prompt, str) else prompt
+
+def _report_cached_tokens(response):
+    # Provider-side prefix caching shows up as cached prompt tokens in the usage block
+    details = getattr(getattr(response, "usage", None), "prompt_tokens_details", None)
+    cached = getattr(details, "cached_tokens", None)
+    if cached:
+        print(f"⚡ Provider reused {cached} of {response.usage.prompt_tokens} prompt tokens from its cache")
+
+def _validation_error(data) -> Optional[str]:
+    """Why `data` isn't a usable pattern document, or None if it is."""
+    try:
+        validate_pattern(data)
+    except Exception as e:
+        return str(e) or e.__class__.__name__
+    return None
+
+def _cached_pattern(cache: ResponseCache, key: str) -> Optional[dict]:
+    """Cached response for `key`; entries that don't validate (e.g. from an older parser) are dropped as misses."""
+    cached = cache.get(key)
+    error = _validation_error(cached) if cached is not None else None
+    if error:
+        print(f"⚠️  Dropping invalid cached pattern response ({error})")
+        cache.discard(key)
+        return None
+    return cached
+
+def _cache_pattern(cache: ResponseCache, key: str, data: dict):
+    """Cache a response only once it validates, so a bad one is regenerated next time instead of replayed."""
+    error = _validation_error(data)
+    if error:
+        print(f"⚠️  Not caching invalid pattern response ({error})")
+        return
+    cache.put(key, data)
+
+def request_metadata(layer: str = "melody", key: str = "C minor", bpm: int = 120, bars: int = 8) -> dict:
+    """Metadata describing a request; compact responses are built on top of it."""
+    return {
+        "layer": layer,
+        "bpm": bpm,
+        "key": key,
+        "bars": bars
+    }
+
+def mock_pattern(layer: str = "melody", key: str = "C minor", bpm: int = 120, bars: int = 8) -> dict:
+    """Return a fixed pattern used when no API key is configured."""
+    return {
+        "metadata": request_metadata(layer, key, bpm, bars),
+        "pattern": [
+            {"note": 60, "velocity": 90, "duration": 480, "bar": 1, "beat": 1.0},
+            {"note": 62, "velocity": 85, "duration": 240, "bar": 1, "beat": 2.0},
+            {"note": 64, "velocity": 88, "duration": 240, "bar": 1, "beat": 3.0},
+            {"note": 65, "velocity": 92, "duration": 480, "bar": 1, "beat": 4.0},
+            {"note": 67, "velocity": 87, "duration": 480, "bar": 2, "beat": 1.0},
+            {"note": 69, "velocity": 90, "duration": 240, "bar": 2, "beat": 2.0},
+            {"note": 67, "velocity": 85, "duration": 240, "bar": 2, "beat": 3.0},
+            {"note": 65, "velocity": 88, "duration": 480, "bar": 2, "beat": 4.0}
+        ]
+    }
+
+def generate_pattern(prompt: Union[str, List[dict]], model="gpt-5-mini", layer: str = "melody", key: str = "C minor", bpm: int = 120, bars: int = 8,
+                     pattern_format: str = "json") -> dict:
+    """Generate a pattern using OpenAI API or return a mock pattern for testing.
+    
+    `prompt` is plain text or the messages from build_messages. `pattern_format` must match the
+    format the prompt asks for ("json" or "compact"); either way the result is a pattern document
+    with "metadata" and "pattern".
+    """
     
     # Check if we have an API key, if not return a mock pattern
     api_key = os.getenv("OPENAI_API_KEY")
     if not api_key:
         print("⚠️  No OPENAI_API_KEY found, using mock pattern for testing...")
-        return {
-            "metadata": {
-                "layer": layer,
-                "bpm": bpm,
-                "key": key,
-                "bars": bars
-            },
-            "pattern": [
-                {"note": 60, "velocity": 90, "duration": 480, "bar": 1, "beat": 1.0},
-                {"note": 62, "velocity": 85, "duration": 240, "bar": 1, "beat": 2.0},
-                {"note": 64, "velocity": 88, "duration": 240, "bar": 1, "beat": 3.0},
-                {"note": 65, "velocity": 92, "duration": 480, "bar": 1, "beat": 4.0},
-                {"note": 67, "velocity": 87, "duration": 480, "bar": 2, "beat": 1.0},
-                {"note": 69, "velocity": 90, "duration": 240, "bar": 2, "beat": 2.0},
-                {"note": 67, "velocity": 85, "duration": 240, "bar": 2, "beat": 3.0},
-                {"note": 65, "velocity": 88, "duration": 480, "bar": 2, "beat": 4.0}
-            ]
-        }
+        return mock_pattern(layer, key, bpm, bars)
+    
+    # Identical requests are served from the response cache without touching the network
+    cache = get_response_cache()
+    response_format = RESPONSE_FORMATS[pattern_format]
+    cache_key = cache.make_key(model, prompt, response_format, cache.pick_variant())
+    cached = _cached_pattern(cache, cache_key)
+    if cached is not None:
+        print("⚡ Using cached pattern response")
+        return cached
     
     # Use actual OpenAI API if key is available
-    client = OpenAI(api_key=api_key)
-    response = client.chat.completions.create(
+    client = get_client(api_key)
+    response = call_with_retries(lambda: client.chat.completions.create(
         model=model,
-        messages=[{"role": "user", "content": prompt}],
-        response_format={"type": "json_object"},
-    )
-    return json.loads(response.choices[0].message.content)
\ No newline at end of file
+        messages=_messages(prompt),
+        response_format=response_format,
+    ))
+    _report_cached_tokens(response)
+    data = parse_pattern_text(response.choices[0].message.content, request_metadata(layer, key, bpm, bars))
+    _cache_pattern(cache, cache_key, data)
+    return data
+
+class PatternStream:
+    """Iterate over pattern events as the model streams them.
+    
+    Events are yielded as soon as each one is complete. Once iteration finishes, `metadata` and
+    `data` hold the full response document. If the connection drops after some events have arrived,
+    iteration stops early and `data` keeps the events received so far with `partial` set.
+    """
+    
+    def __init__(self, prompt: Union[str, List[dict]], model="gpt-5-mini", layer: str = "melody", key: str = "C minor", bpm: int = 120, bars: int = 8,
+                 pattern_format: str = "json"):
+        self.prompt = prompt
+        self.model = model
+        self.pattern_format = pattern_format
+        self.fallback = (layer, key, bpm, bars)
+        self.metadata: Optional[dict] = None
+        self.data: Optional[dict] = None
+        self.partial = False
+    
+    def __iter__(self) -> Iterator[dict]:
+        api_key = os.getenv("OPENAI_API_KEY")
+        if not api_key:
+            print("⚠️  No OPENAI_API_KEY found, using mock pattern for testing...")
+            yield from self._replay(mock_pattern(*self.fallback))
+            return
+        
+        cache = get_response_cache()
+        response_format = RESPONSE_FORMATS[self.pattern_format]
+        cache_key = cache.make_key(self.model, self.prompt, response_format, cache.pick_variant())
+        cached = _cached_pattern(cache, cache_key)
+        if cached is not None:
+            print("⚡ Using cached pattern response")
+            yield from self._replay(cached)
+            return
+        
+        # Retries cover opening the stream; once events are flowing a failure keeps what has arrived
+        client = get_client(api_key)
+        stream = call_with_retries(lambda: client.chat.completions.create(
+            model=self.model,
+            messages=_messages(self.prompt),
+            response_format=response_format,
+            stream=True,
+        ), stream=True)
+        compact = self.pattern_format == "compact"
+        parser = CompactPatternParser() if compact else PatternStreamParser()
+        events = []
+        finish_reason = None
+        try:
+            for chunk in stream:
+                if not chunk.choices:
+                    continue
+                finish_reason = chunk.choices[0].finish_reason or finish_reason
+                if not chunk.choices[0].delta.content:
+                    continue
+                for event in parser.feed(chunk.choices[0].delta.content):
+                    events.append(event)
+                    yield event
+            if compact:
+                for event in parser.finish():
+                    events.append(event)
+                    yield event
+        except ValueError:
+            # Text the parsers reject is a bad response, not a dropped connection
+            raise
+        except Exception as e:
+            if not events:
+                raise
+            print(f"⚠️  Pattern stream interrupted after {len(events)} events ({e}), keeping what arrived")
+            self.partial = True
+        finally:
+            stream.close()
+        
+        # A stream that ends without a complete document was cut off, even if no error was raised
+        if not self.partial:
+            try:
+                if compact:
+                    if finish_reason != "stop":
+                        raise ValueError(f"stream finished with {finish_reason!r}")
+                    self.data = {"metadata": {**request_metadata(*self.fallback), **(parser.metadata or {})}, "pattern": events}
+                else:
+                    self.data = json.loads(parser.text)
+            except ValueError:
+                if not events:
+                    raise
+                print(f"⚠️  Pattern stream ended early after {len(events)} events, keeping what arrived")
+                self.partial = True
+        
+        self.metadata = parser.metadata or (request_metadata(*self.fallback) if compact else {})
+        if self.partial:
+            self.data = {"metadata": {**self.metadata, "partial": True}, "pattern": events}
+            return
+        _cache_pattern(cache, cache_key, self.data)
+    
+    def _replay(self, data: dict) -> Iterator[dict]:
+        self.data = data
+        self.metadata = data.get("metadata") if isinstance(data.get("metadata"), dict) else {}
+        events = data.get("pattern")
+        yield from events if isinstance(events, list) else []
+
+def stream_pattern(prompt: Union[str, List[dict]], model="gpt-5-mini", layer: str = "melody", key: str = "C minor", bpm: int = 120, bars: int = 8,
+                   pattern_format: str = "json") -> PatternStream:
+    """Stream a pattern's events as they are generated; see PatternStream."""
+    return PatternStream(prompt, model, layer, key, bpm, bars, pattern_format)
+
+async def _generate_pattern_async(client: "AsyncOpenAI", request: dict, model: str) -> dict:
+    pattern_format = request.get("format", "json")
+    response = await acall_with_retries(lambda: client.chat.completions.create(
+        model=model,
+        messages=_messages(request["prompt"]),
+        response_format=RESPONSE_FORMATS[pattern_format],
+    ))
+    _report_cached_tokens(response)
+    metadata = request_metadata(request.get("layer", "melody"), request.get("key", "C minor"), request.get("bpm", 120), request.get("bars", 8))
+    return parse_pattern_text(response.choices[0].message.content, metadata)
+
+def generate_patterns(requests: List[dict], model="gpt-5-mini") -> List[dict]:
+    """Generate several patterns concurrently with the async OpenAI client.
+    
+    Each request is a dict with "prompt", an optional "format" ("json" or "compact") and the
+    layer/key/bpm/bars used for metadata and mock patterns. Results are returned in request order.
+    """
+    api_key = os.getenv("OPENAI_API_KEY")
+    if not api_key:
+        print("⚠️  No OPENAI_API_KEY found, using mock patterns for testing...")
+        return [mock_pattern(r.get("layer", "melody"), r.get("key", "C minor"), r.get("bpm", 120), r.get("bars", 8)) for r in requests]
+    
+    # Only the requests missing from the response cache go to the network
+    cache = get_response_cache()
+    keys = [cache.make_key(model, r["prompt"], RESPONSE_FORMATS[r.get("format", "json")], cache.pick_variant()) for r in requests]
+    results = [_cached_pattern(cache, key) for key in keys]
+    missing = [i for i, result in enumerate(results) if result is None]
+    if len(missing) < len(requests):
+        print(f"⚡ Using {len(requests) - len(missing)} cached pattern response(s)")
+    
+    async def generate_missing() -> List[dict]:
+        from openai import AsyncOpenAI
+        async with AsyncOpenAI(api_key=api_key, timeout=_timeout(), max_retries=0) as client:
+            return await asyncio.gather(*(_generate_pattern_async(client, requests[i], model) for i in missing))
+    
+    if missing:
+        for i, data in zip(missing, asyncio.run(generate_missing())):
+            _cache_pattern(cache, keys[i], data)
+            results[i] = data
+    return results
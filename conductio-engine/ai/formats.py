@@ -0,0 +1,2 @@
+# Pattern formats the model can be asked for; kept free of heavy imports so the CLI can offer them cheaply
+PATTERN_FORMATS = ("json", "compact")
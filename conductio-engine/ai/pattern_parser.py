@@ -1,10 +1,515 @@
-def validate_pattern(data: dict) -> dict:
-    """Ensure AI output follows Conductio pattern schema."""
-    if "pattern" not in data:
+import json
+import reprlib
+from typing import List, Optional, Tuple
+import numpy as np
+from ai.formats import PATTERN_FORMATS
+
+TICKS_PER_BEAT = 480
+DEFAULT_TIME_SIGNATURE = (4, 4)
+
+# Column layout for validated pattern events; "tick" is derived from bar/beat
+PATTERN_DTYPE = np.dtype([
+    ("note", np.int16),
+    ("velocity", np.int16),
+    ("duration", np.int32),
+    ("bar", np.int32),
+    ("beat", np.float32),
+    ("tick", np.int64),
+])
+
+# Fields read from each AI event, with the default used when one is missing (None = required)
+PATTERN_FIELDS = ("note", "velocity", "duration", "bar", "beat")
+PATTERN_DEFAULTS = {"note": None, "velocity": 90, "duration": 480, "bar": 1, "beat": 1.0}
+
+# Upper bounds for AI values, applied before the casts so huge numbers can't wrap around
+MAX_EVENT_BAR = 1024
+MAX_EVENT_BEAT = 1024.0
+MAX_EVENT_DURATION = TICKS_PER_BEAT * 4 * MAX_EVENT_BAR
+
+# Variations a motif placement can apply, and a cap on how far motifs may expand
+MOTIF_VARIATIONS = ("invert", "retrograde", "sparse")
+MAX_PATTERN_EVENTS = 20000
+
+def parse_time_signature(value) -> Tuple[int, int]:
+    """Parse a time signature given as "3/4" or [3, 4], falling back to 4/4."""
+    if value is None:
+        return DEFAULT_TIME_SIGNATURE
+    try:
+        if isinstance(value, str):
+            numerator, denominator = (int(part) for part in value.split("/"))
+        else:
+            numerator, denominator = (int(part) for part in value)
+    except (TypeError, ValueError):
+        raise ValueError(f"Invalid time signature: {value!r}")
+    if numerator < 1 or denominator not in (1, 2, 4, 8, 16, 32):
+        raise ValueError(f"Invalid time signature: {value!r}")
+    return numerator, denominator
+
+def _compute_ticks(array: np.ndarray, time_signature: Tuple[int, int]):
+    """Fill the "tick" column from bar/beat for the given time signature."""
+    # Beats count in units of the time signature's denominator (a quarter note in 4/4, an eighth in 6/8)
+    beats_per_bar, beat_unit = time_signature
+    ticks_per_beat_unit = TICKS_PER_BEAT * 4 / beat_unit
+    array["tick"] = np.rint(((array["bar"] - 1) * beats_per_bar + (array["beat"] - 1.0)) * ticks_per_beat_unit)
+
+class Pattern:
+    """Validated pattern events stored column-wise in a NumPy structured array."""
+
+    def __init__(self, events: np.ndarray, metadata: Optional[dict] = None):
+        self.events = events
+        self.metadata = metadata or {}
+        self.time_signature = parse_time_signature(self.metadata.get("time_signature"))
+
+    def __len__(self) -> int:
+        return len(self.events)
+
+    # Zero-copy column views used by the MIDI builder and the renderer
+    @property
+    def notes(self) -> np.ndarray:
+        return self.events["note"]
+
+    @property
+    def velocities(self) -> np.ndarray:
+        return self.events["velocity"]
+
+    @property
+    def durations(self) -> np.ndarray:
+        return self.events["duration"]
+
+    @property
+    def bars(self) -> np.ndarray:
+        return self.events["bar"]
+
+    @property
+    def beats(self) -> np.ndarray:
+        return self.events["beat"]
+
+    @property
+    def ticks(self) -> np.ndarray:
+        return self.events["tick"]
+
+    @classmethod
+    def from_events(cls, events: list, metadata: Optional[dict] = None) -> "Pattern":
+        """Build a Pattern from a list of event dicts, applying defaults and clamping MIDI ranges."""
+        if not isinstance(events, list) or not all(isinstance(ev, dict) for ev in events):
+            raise ValueError("Invalid AI response: 'pattern' must be a list of event objects")
+
+        # Single pass to pull the raw values out; everything after this is column-wise
+        try:
+            raw = np.array([[ev.get(field) for field in PATTERN_FIELDS] for ev in events], dtype=np.float64)
+        except (TypeError, ValueError) as e:
+            raise ValueError(f"Invalid AI response: non-numeric event value ({e})")
+        raw = raw.reshape(len(events), len(PATTERN_FIELDS))
+
+        columns = {}
+        for i, field in enumerate(PATTERN_FIELDS):
+            column = raw[:, i]
+            missing = np.isnan(column)
+            if missing.any():
+                if PATTERN_DEFAULTS[field] is None:
+                    raise ValueError(f"Invalid AI response: event missing '{field}'")
+                column[missing] = PATTERN_DEFAULTS[field]
+            if not np.isfinite(column).all():
+                raise ValueError(f"Invalid AI response: non-finite '{field}'")
+            columns[field] = column
+
+        array = np.empty(len(events), dtype=PATTERN_DTYPE)
+        array["note"] = np.clip(np.rint(columns["note"]), 0, 127)
+        array["velocity"] = np.clip(np.rint(columns["velocity"]), 1, 127)
+        array["duration"] = np.clip(np.rint(columns["duration"]), 1, MAX_EVENT_DURATION)
+        array["bar"] = np.clip(np.rint(columns["bar"]), 1, MAX_EVENT_BAR)
+        array["beat"] = np.clip(columns["beat"], 1.0, MAX_EVENT_BEAT)
+        _compute_ticks(array, parse_time_signature((metadata or {}).get("time_signature")))
+        return cls(array, metadata)
+
+    def to_dicts(self) -> list:
+        """Return the events as plain dicts (the JSON schema the AI produces)."""
+        return [
+            {"note": note, "velocity": velocity, "duration": duration, "bar": bar, "beat": beat}
+            for note, velocity, duration, bar, beat, _ in self.events.tolist()
+        ]
+
+    def to_dict(self) -> dict:
+        """Return the full pattern document (metadata + events) for pattern.json."""
+        return {"metadata": self.metadata, "pattern": self.to_dicts()}
+
+def _ticks_per_bar(time_signature: Tuple[int, int]) -> Tuple[float, float]:
+    beats_per_bar, beat_unit = time_signature
+    ticks_per_beat_unit = TICKS_PER_BEAT * 4 / beat_unit
+    return beats_per_bar * ticks_per_beat_unit, ticks_per_beat_unit
+
+def place_motif(motif: np.ndarray, start_bar: int, transpose: int = 0, velocity: int = 0, variation=None,
+                time_signature: Tuple[int, int] = DEFAULT_TIME_SIGNATURE) -> np.ndarray:
+    """Return a copy of validated motif events placed at `start_bar` with the given changes applied.
+
+    Motif bars count from 1. `transpose` shifts pitches by semitones, `velocity` is added to every
+    velocity and `variation` is one or more of MOTIF_VARIATIONS.
+    """
+    events = motif.copy()
+    variations = [variation] if isinstance(variation, str) else list(variation or [])
+    unknown = [name for name in variations if name not in MOTIF_VARIATIONS]
+    if unknown:
+        raise ValueError(f"Invalid AI response: unknown motif variation(s) {', '.join(map(str, unknown))}")
+
+    if "sparse" in variations:
+        # Keep only the notes that start on a beat
+        events = events[events["beat"] == np.floor(events["beat"])]
+    if "invert" in variations and len(events):
+        # Mirror pitches around the motif's first note
+        pivot = int(events["note"][np.lexsort((events["beat"], events["bar"]))[0]])
+        events["note"] = np.clip(2 * pivot - events["note"].astype(np.int32), 0, 127)
+    if "retrograde" in variations and len(events):
+        # Play the motif backwards within the bars it spans
+        ticks_per_bar, ticks_per_beat_unit = _ticks_per_bar(time_signature)
+        starts = (events["bar"] - 1) * ticks_per_bar + (events["beat"] - 1.0) * ticks_per_beat_unit
+        span = float(events["bar"].max()) * ticks_per_bar
+        starts = np.clip(span - starts - events["duration"], 0, None)
+        events["bar"] = starts // ticks_per_bar + 1
+        events["beat"] = (starts % ticks_per_bar) / ticks_per_beat_unit + 1.0
+
+    events["bar"] += int(start_bar) - 1
+    events["note"] = np.clip(events["note"].astype(np.int32) + int(transpose), 0, 127)
+    events["velocity"] = np.clip(events["velocity"].astype(np.int32) + int(velocity), 1, 127)
+    return events
+
+def _placement_bars(entry: dict, motif: np.ndarray) -> list:
+    """Start bars for one structure entry: an explicit "bars" list, or "start" + "times" (+ "every").
+
+    Placement counts are checked against MAX_PATTERN_EVENTS before anything is expanded, and start
+    bars must lie within MAX_EVENT_BAR.
+    """
+    try:
+        if "bars" in entry:
+            bars = entry["bars"] if isinstance(entry["bars"], list) else [entry["bars"]]
+            if len(bars) > MAX_PATTERN_EVENTS:
+                raise ValueError(f"more than {MAX_PATTERN_EVENTS} placements")
+        else:
+            length = int(motif["bar"].max()) if len(motif) else 1
+            start, times, every = int(entry.get("start", 1)), int(entry.get("times", 1)), int(entry.get("every", length))
+            if times > MAX_PATTERN_EVENTS:
+                raise ValueError(f"more than {MAX_PATTERN_EVENTS} placements")
+            bars = [start + i * every for i in range(max(0, times))]
+        bars = [max(1, int(bar)) for bar in bars]
+    except OverflowError:
+        raise ValueError("placement is out of range")
+    if bars and max(bars) > MAX_EVENT_BAR:
+        raise ValueError(f"start bar {max(bars)} is past bar {MAX_EVENT_BAR}")
+    return bars
+
+def expand_motifs(pattern: Pattern, motifs, structure) -> Pattern:
+    """Add every motif placement listed in `structure` to the pattern's explicit events.
+
+    `motifs` maps names to event lists (bars counted from 1); each structure entry names a motif,
+    where it starts, and optionally "transpose", "velocity" and "variation".
+    """
+    if not structure:
+        return pattern
+    if not isinstance(motifs, dict) or not isinstance(structure, list):
+        raise ValueError("Invalid AI response: 'motifs' must be an object and 'structure' a list")
+
+    validated = {name: Pattern.from_events(events, pattern.metadata).events for name, events in motifs.items()}
+    for name, events in validated.items():
+        if not len(events):
+            raise ValueError(f"Invalid AI response: motif {name!r} has no events")
+    arrays = [pattern.events]
+    total = len(pattern)
+    placements = 0
+    for entry in structure:
+        if not isinstance(entry, dict) or entry.get("motif") not in validated:
+            raise ValueError(f"Invalid AI response: structure entry {reprlib.repr(entry)} does not name a declared motif")
+        motif = validated[entry["motif"]]
+        try:
+            start_bars = _placement_bars(entry, motif)
+            # Shifts past ±127 clamp to the same notes anyway, and stay within int32 this way
+            transpose, velocity = (max(-127, min(127, int(entry.get(field, 0)))) for field in ("transpose", "velocity"))
+        except (TypeError, ValueError, OverflowError) as e:
+            raise ValueError(f"Invalid AI response: bad structure entry {reprlib.repr(entry)} ({e})")
+
+        total += len(motif) * len(start_bars)
+        placements += len(start_bars)
+        if total > MAX_PATTERN_EVENTS or placements > MAX_PATTERN_EVENTS:
+            raise ValueError(f"Invalid AI response: motifs expand to more than {MAX_PATTERN_EVENTS} events")
+        for start_bar in start_bars:
+            arrays.append(place_motif(motif, start_bar, transpose, velocity, entry.get("variation"), pattern.time_signature))
+
+    events = np.concatenate(arrays)
+    _compute_ticks(events, pattern.time_signature)
+    return Pattern(events, pattern.metadata)
+
+def stitch_sections(patterns: List[Pattern], sections: List[Tuple[int, int]], metadata: Optional[dict] = None) -> Pattern:
+    """Join separately generated sections into one Pattern.
+
+    Each section's bars are numbered from 1 and are rebased to its (start_bar, bars) slot; notes the
+    model wrote past the end of its section are dropped. At each seam, notes still sounding when the
+    next section starts playing are cut at that onset, and nothing rings past the end of the piece.
+    """
+    metadata = metadata if metadata is not None else (patterns[0].metadata if patterns else {})
+    time_signature = parse_time_signature(metadata.get("time_signature"))
+    arrays = []
+    for pattern, (start_bar, bars) in zip(patterns, sections):
+        events = pattern.events[pattern.bars <= bars].copy()
+        events["bar"] += start_bar - 1
+        arrays.append(events)
+    events = np.concatenate(arrays) if arrays else np.empty(0, dtype=PATTERN_DTYPE)
+    _compute_ticks(events, time_signature)
+
+    ticks_per_bar, _ = _ticks_per_bar(time_signature)
+    for start_bar, _ in sections[1:]:
+        seam = (start_bar - 1) * ticks_per_bar
+        following = events["tick"][events["tick"] >= seam]
+        if len(following) == 0:
+            continue
+        next_onset = following.min()
+        held = (events["tick"] < seam) & (events["tick"] + events["duration"] > next_onset)
+        events["duration"][held] = next_onset - events["tick"][held]
+
+    if sections:
+        end = (sections[-1][0] + sections[-1][1] - 1) * ticks_per_bar
+        events["duration"] = np.clip(np.minimum(events["duration"], end - events["tick"]), 1, None)
+    return Pattern(events, metadata)
+
+def validate_pattern(data: dict) -> Pattern:
+    """Ensure AI output follows Conductio pattern schema, expanding any declared motifs."""
+    if "pattern" not in data and not data.get("structure"):
         raise ValueError("Invalid AI response: missing 'pattern'")
-    for ev in data["pattern"]:
-        ev.setdefault("velocity", 90)
-        ev.setdefault("duration", 480)
-        ev.setdefault("beat", 1.0)
-        ev.setdefault("bar", 1)
-    return data
\ No newline at end of file
+    metadata = data.get("metadata")
+    pattern = Pattern.from_events(data.get("pattern", []), metadata if isinstance(metadata, dict) else None)
+    return expand_motifs(pattern, data.get("motifs"), data.get("structure"))
+
+class PatternStreamParser:
+    """Incremental JSON parser that picks pattern events out of a streamed model response.
+
+    Text is fed in arbitrary chunks; every event object inside the top-level "pattern" array is
+    returned as soon as its closing brace arrives, and the top-level "metadata" object is kept in
+    `metadata` once complete. Only the nesting structure is tracked, so nothing is re-parsed.
+    """
+
+    def __init__(self):
+        self.metadata: Optional[dict] = None
+        self._buffer = ""
+        self._pos = 0
+        self._stack = []
+        self._in_string = False
+        self._escape = False
+        self._string_start = 0
+        self._last_string = None
+        self._key = None
+        self._value_start = None
+        self._value_depth = 0
+
+    def feed(self, text: str) -> List[dict]:
+        """Consume the next chunk of response text and return any events it completed."""
+        self._buffer += text
+        events = []
+        buffer, stack = self._buffer, self._stack
+        for pos in range(self._pos, len(buffer)):
+            char = buffer[pos]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                    if len(stack) == 1:
+                        self._last_string = buffer[self._string_start:pos + 1]
+            elif char == '"':
+                self._in_string = True
+                self._string_start = pos
+            elif char == ":" and len(stack) == 1 and self._last_string is not None:
+                self._key = json.loads(self._last_string)
+            elif char == "," and len(stack) == 1:
+                self._last_string = None
+            elif char in "{[":
+                stack.append(char)
+                # An event object inside the pattern array, or the metadata object itself
+                if char == "{" and ((len(stack) == 3 and stack[1] == "[" and self._key == "pattern") or
+                                    (len(stack) == 2 and self._key == "metadata")):
+                    self._value_start = pos
+                    self._value_depth = len(stack)
+            elif char in "}]":
+                # Only the brace that returns to the value's own depth closes it, not one of a nested object
+                if char == "}" and self._value_start is not None and len(stack) == self._value_depth:
+                    try:
+                        value = json.loads(buffer[self._value_start:pos + 1])
+                    except ValueError:
+                        value = None
+                    if isinstance(value, dict):
+                        if len(stack) == 3:
+                            events.append(value)
+                        else:
+                            self.metadata = value
+                    self._value_start = None
+                if stack:
+                    stack.pop()
+        self._pos = len(buffer)
+        return events
+
+    @property
+    def text(self) -> str:
+        """Everything fed so far."""
+        return self._buffer
+
+class PatternBuilder:
+    """Validates pattern events in batches as they arrive and assembles them into one Pattern."""
+
+    def __init__(self, metadata: Optional[dict] = None):
+        self.metadata = metadata
+        self._arrays = []
+
+    def __len__(self) -> int:
+        return sum(len(array) for array in self._arrays)
+
+    def add(self, events: list):
+        """Validate a batch of event dicts; errors surface here rather than after the whole response."""
+        if events:
+            self._arrays.append(Pattern.from_events(events, self.metadata).events)
+
+    def build(self, metadata: Optional[dict] = None) -> Pattern:
+        """Return the assembled Pattern, recomputing ticks if the final metadata changed the time signature."""
+        if metadata is not None:
+            self.metadata = metadata
+        array = np.concatenate(self._arrays) if self._arrays else np.empty(0, dtype=PATTERN_DTYPE)
+        pattern = Pattern(array, self.metadata)
+        _compute_ticks(array, pattern.time_signature)
+        return pattern
+
+def _number(text: str):
+    try:
+        return int(text)
+    except ValueError:
+        return float(text)
+
+class CompactPatternParser:
+    """Line-oriented parser for the compact pattern format.
+
+    One CSV row per note, plus a few directives:
+
+        @meta {"time_signature": "3/4"}     optional JSON metadata
+        note,velocity,duration,bar,beat     optional header choosing the column order
+        60,90,480,1,1                       one note; missing trailing columns use the defaults
+        @motif A ... @end                   define a motif (bars counted from 1) without playing it
+        @repeat A 3 5 7                     play motif A starting at bars 3, 5 and 7
+        @repeat A 9 transpose=5 velocity=-10 variation=invert,sparse
+                                            ...with the same changes a JSON structure entry allows
+
+    Text may be fed in chunks; each event is returned as soon as its line is complete. Lines of
+    prose without commas (e.g. "Here is the pattern:") are skipped, and repeats are expanded under
+    the same MAX_PATTERN_EVENTS cap as JSON motifs, counting every event returned so far.
+    """
+
+    def __init__(self):
+        self.metadata: Optional[dict] = None
+        self.motifs = {}
+        self._columns = PATTERN_FIELDS
+        self._motif = None
+        self._pending = ""
+        self._chunks = []
+        self._emitted = 0
+
+    def feed(self, text: str) -> List[dict]:
+        """Consume the next chunk of response text and return any events it completed."""
+        self._chunks.append(text)
+        lines = (self._pending + text).split("\n")
+        self._pending = lines.pop()
+        events = []
+        for line in lines:
+            events.extend(self._parse_line(line))
+        return events
+
+    def finish(self) -> List[dict]:
+        """Parse the final line if the text didn't end with a newline."""
+        line, self._pending = self._pending, ""
+        return self._parse_line(line)
+
+    @property
+    def text(self) -> str:
+        """Everything fed so far."""
+        return "".join(self._chunks)
+
+    def _parse_line(self, line: str) -> List[dict]:
+        events = self._parse_row(line)
+        self._emitted += len(events)
+        return events
+
+    def _parse_row(self, line: str) -> List[dict]:
+        line = line.strip()
+        if not line or line.startswith("```"):
+            return []
+        if line.startswith("@"):
+            return self._parse_directive(line)
+
+        fields = [field.strip() for field in line.split(",")]
+        try:
+            values = [_number(field) if field else None for field in fields]
+        except ValueError:
+            # A header row naming the columns
+            columns = tuple(field.lower() for field in fields)
+            unknown = sorted(set(columns) - set(PATTERN_FIELDS))
+            if unknown and len(fields) == 1:
+                # Models sometimes add a line of prose around the rows
+                return []
+            if unknown:
+                raise ValueError(f"Invalid compact pattern: unknown column(s) {', '.join(unknown)}")
+            self._columns = columns
+            return []
+
+        event = {column: value for column, value in zip(self._columns, values) if value is not None}
+        if self._motif is not None:
+            self._motif[1].append(event)
+            return []
+        return [event]
+
+    def _parse_directive(self, line: str) -> List[dict]:
+        directive, _, rest = line.partition(" ")
+        directive, rest = directive.lower(), rest.strip()
+        if directive == "@meta":
+            try:
+                metadata = json.loads(rest)
+            except ValueError as e:
+                raise ValueError(f"Invalid compact pattern: bad @meta ({e})")
+            if isinstance(metadata, dict):
+                self.metadata = {**(self.metadata or {}), **metadata}
+            return []
+        if directive == "@motif":
+            if not rest:
+                raise ValueError("Invalid compact pattern: @motif needs a name")
+            self._motif = (rest, [])
+            return []
+        if directive == "@end":
+            if self._motif is not None:
+                name, events = self._motif
+                self.motifs[name] = events
+                self._motif = None
+            return []
+        if directive == "@repeat":
+            name, *arguments = rest.split()
+            if name not in self.motifs:
+                raise ValueError(f"Invalid compact pattern: @repeat of undefined motif '{name}'")
+            options = dict(argument.partition("=")[::2] for argument in arguments if "=" in argument)
+            try:
+                starts = [int(argument) for argument in arguments if "=" not in argument]
+                transpose, velocity = int(options.get("transpose", 0)), int(options.get("velocity", 0))
+            except ValueError:
+                raise ValueError(f"Invalid compact pattern: bad @repeat arguments in '{line}'")
+            variation = options["variation"].split(",") if options.get("variation") else None
+
+            # Expanded like a JSON structure entry, so the same placement and size checks apply
+            entry = {"motif": name, "bars": starts, "transpose": transpose, "velocity": velocity, "variation": variation}
+            placed = expand_motifs(Pattern.from_events([], self.metadata), {name: self.motifs[name]}, [entry])
+            if self._emitted + len(placed) > MAX_PATTERN_EVENTS:
+                raise ValueError(f"Invalid compact pattern: repeats expand to more than {MAX_PATTERN_EVENTS} events")
+            return placed.to_dicts()
+        raise ValueError(f"Invalid compact pattern: unknown directive '{directive}'")
+
+def parse_pattern_text(text: str, metadata: Optional[dict] = None) -> dict:
+    """Parse a model response in either the JSON or the compact format into a pattern document.
+
+    `metadata` (typically the request parameters) is used as the base for compact responses,
+    which only carry metadata the model chose to add with @meta.
+    """
+    if text.lstrip().startswith("{"):
+        return json.loads(text)
+    parser = CompactPatternParser()
+    events = parser.feed(text) + parser.finish()
+    return {"metadata": {**(metadata or {}), **(parser.metadata or {})}, "pattern": events}
@@ -1,128 +1,66 @@
-def build_prompt(layer: str, key: str, bpm: int, bars: int, instrument: str = "piano", genre: str = "general") -> str:
-    """Construct an instruction prompt for AI generation."""
-    
-    # Get instrument-specific guidance
-    instrument_guidance = get_instrument_guidance(layer, instrument)
-    
-    return f"""
-You are an expert music pattern composer.
-Generate a {bars}-bar {layer} pattern for {instrument} in {key} at {bpm} BPM in {genre} style.
-Focus on musical coherence and playability for this specific instrument and genre.
+import hashlib
+from functools import lru_cache
+from typing import List
+from generation.instruments import GM_INSTRUMENTS, INSTRUMENT_ALIASES, normalize_instrument_name
 
-{instrument_guidance}
+# Bump whenever the static system prompt changes, so cached prefixes and responses are easy to tell apart
+PROMPT_VERSION = "2"
 
-Return ONLY valid JSON in this format:
-{{
-  "metadata": {{
-    "layer": "{layer}",
-    "bpm": {bpm},
-    "key": "{key}",
-    "bars": {bars},
-    "instrument": "{instrument}",
-    "genre": "{genre}"
-  }},
-  "pattern": [
-    {{
-      "note": 55,
-      "velocity": 90,
-      "duration": 480,
-      "bar": 1,
-      "beat": 1.0
-    }},
-    {{
-      "note": 58,
-      "velocity": 90,
-      "duration": 480,
-      "bar": 1,
-      "beat": 1.0
-    }}
-  ]
-}}
-
-------
-weirdness: 50%
-variability: 70%
-
-"""
-
-def get_instrument_guidance(layer: str, instrument: str) -> str:
-    """Get instrument-specific composition guidance."""
-    
-    # Normalize instrument name for matching
-    inst_lower = instrument.lower().replace("_", " ").replace("-", " ")
-    
-    # Guitar family guidance
-    if any(word in inst_lower for word in ["guitar", "bass"]):
-        if "bass" in inst_lower:
-            return """
+# Composition guidance per instrument family; every block is part of the static system prompt
+INSTRUMENT_GUIDANCE = {
+    "bass": """
 BASS INSTRUMENT GUIDELINES:
-
 - Emphasize root notes and fifth intervals
 - Create rhythmic foundation with steady patterns
 - Use techniques like walking bass lines or syncopated rhythms
 - Velocity range 70-110 for consistent bass presence
-"""
-        else:
-            return """
+""",
+    "guitar": """
 GUITAR INSTRUMENT GUIDELINES:
 - Use guitar-friendly keys and chord shapes
 - Create patterns that work with guitar fingering
 - Use realistic note ranges: E2-E5 (MIDI 40-76)
 - Include chord tones and passing notes
 - Velocity range 60-120 for dynamic expression
-"""
-    
-    # Piano family guidance
-    elif any(word in inst_lower for word in ["piano", "keyboard", "harpsichord"]):
-        return """
+""",
+    "piano": """
 PIANO INSTRUMENT GUIDELINES:
 - Full keyboard range available: A0-C8 (MIDI 21-108)
 - Create flowing melodic lines or rich harmonic patterns
 - Use piano-specific techniques like arpeggios, scales, or chord voicings
 - Balance between melody and harmony as appropriate for the layer
 - Velocity range 40-127 for full dynamic expression
-"""
-    
-    # String instruments guidance
-    elif any(word in inst_lower for word in ["violin", "viola", "cello", "strings"]):
-        if "cello" in inst_lower:
-            return """
+""",
+    "cello": """
 CELLO INSTRUMENT GUIDELINES:
 - Focus on rich, warm melodic lines in mid-low register
 - Create flowing legato passages with occasional pizzicato
 - Use string-crossing patterns and position changes
 - Velocity range 50-115 for expressive bowing dynamics
-"""
-        elif "violin" in inst_lower:
-            return """
+""",
+    "violin": """
 VIOLIN INSTRUMENT GUIDELINES:
 - Create soaring melodic lines with expressive phrasing
 - Include techniques like slurs, vibrato-friendly sustained notes
 - Use string crossings and position changes naturally
 - Velocity range 45-120 for expressive bow dynamics
-"""
-        else:
-            return """
+""",
+    "strings": """
 STRING INSTRUMENT GUIDELINES:
 - Create flowing, lyrical melodic lines
 - Use natural string instrument ranges and techniques
 - Focus on legato phrasing with occasional articulated passages
 - Build expressive crescendos and diminuendos through velocity
 - Velocity range 45-115 for realistic string dynamics
-"""
-    
-    # Brass instruments guidance
-    elif any(word in inst_lower for word in ["trumpet", "trombone", "horn", "brass", "tuba"]):
-        if "tuba" in inst_lower:
-            return """
+""",
+    "tuba": """
 TUBA INSTRUMENT GUIDELINES:
 - Create strong bass foundation with rhythmic emphasis
 - Use sustained notes and rhythmic punctuation
 - Focus on fundamental harmony and bass line movement
 - Velocity range 80-120 for powerful brass presence
-"""
-        else:
-            return """
+""",
+    "brass": """
 BRASS INSTRUMENT GUIDELINES:
 - Create bold, fanfare-like melodic lines
 - Use brass-friendly keys and natural harmonics
@@ -130,11 +68,8 @@ BRASS INSTRUMENT GUIDELINES:
 - Build dramatic crescendos and accents
 - Velocity range 70-127 for powerful brass dynamics
 - Consider muted vs open brass timbres
-"""
-    
-    # Woodwind instruments guidance
-    elif any(word in inst_lower for word in ["flute", "clarinet", "sax", "oboe", "bassoon"]):
-        return """
+""",
+    "woodwind": """
 WOODWIND INSTRUMENT GUIDELINES:
 - Create flowing, breath-aware melodic phrases
 - Use natural scales and arpeggiated patterns
@@ -142,11 +77,8 @@ WOODWIND INSTRUMENT GUIDELINES:
 - Focus on lyrical expression and smooth voice leading
 - Velocity range 50-110 for realistic wind dynamics
 - Consider the instrument's sweet spots and registers
-"""
-    
-    # Synth instruments guidance
-    elif any(word in inst_lower for word in ["synth", "lead", "pad", "electronic"]):
-        return """
+""",
+    "synth": """
 SYNTHESIZER INSTRUMENT GUIDELINES:
 - Create modern, electronic-style patterns
 - Use full range capabilities of synthesizers
@@ -154,119 +86,314 @@ SYNTHESIZER INSTRUMENT GUIDELINES:
 - Experiment with different velocity ranges for filter/envelope effects
 - Velocity range 60-127 for full synthesizer expression
 - Consider sequence-based or pattern-based compositions
-"""
-    
-    # Drum guidance
-    elif layer == "drums":
-        return """
+""",
+    "drums": """
 DRUM PATTERN GUIDELINES:
 - Use standard GM drum mapping: Kick(36), Snare(38), Hi-hat(42), etc.
 - Create rhythmic patterns with kick, snare, and hi-hat foundation
 - Add percussion elements: crash(49), ride(51), toms(41,43,45,47,48,50)
 - Velocity range 60-127 for dynamic drum hits
 - Focus on groove and rhythmic interest
-"""
-    
-    # Default guidance
-    else:
-        return """
+""",
+    "general": """
 GENERAL INSTRUMENT GUIDELINES:
 - Use appropriate range and techniques for the specified instrument
 - Create musically coherent patterns that suit the instrument's characteristics
 - Focus on playability and realistic performance techniques
 - Use velocity range 50-120 for natural expression
-"""
+""",
+}
+
+# Ordered (family, keywords) rules; the first family with a keyword in the instrument name wins
+INSTRUMENT_FAMILY_KEYWORDS = (
+    ("bass", ("bass",)),
+    ("guitar", ("guitar",)),
+    ("piano", ("piano", "keyboard", "harpsichord")),
+    ("cello", ("cello",)),
+    ("violin", ("violin",)),
+    ("strings", ("viola", "strings")),
+    ("tuba", ("tuba",)),
+    ("brass", ("trumpet", "trombone", "horn", "brass")),
+    ("woodwind", ("flute", "clarinet", "sax", "oboe", "bassoon")),
+    ("synth", ("synth", "lead", "pad", "electronic")),
+)
 
-    """Get genre-specific composition guidance."""
-    
-    genre_lower = genre.lower().replace("_", " ").replace("-", " ")
-    
-    if "rock" in genre_lower:
-        return f"""
+def _match_family(name: str, rules) -> str:
+    for family, keywords in rules:
+        if any(word in name for word in keywords):
+            return family
+    return "general"
+
+# Guidance family for every known instrument name and alias, and for every GM program number
+INSTRUMENT_FAMILIES = {
+    name: _match_family(name, INSTRUMENT_FAMILY_KEYWORDS)
+    for name in list(GM_INSTRUMENTS) + list(INSTRUMENT_ALIASES)
+}
+PROGRAM_FAMILIES = [INSTRUMENT_FAMILIES[name] for name in sorted(GM_INSTRUMENTS, key=GM_INSTRUMENTS.get)]
+
+# Composition guidance per genre; the tempo-dependent feel is in GENRE_TEMPO_FEEL so these stay static
+GENRE_GUIDANCE = {
+    "rock": """
 ROCK GENRE GUIDELINES:
 - Use power chords, strong rhythmic patterns, and driving energy
 - Focus on 4/4 time with emphasis on beats 1 and 3
-- {layer} should have rock-appropriate dynamics and phrasing
+- Every layer should have rock-appropriate dynamics and phrasing
 - Include characteristic rock rhythms like eighth note drives or syncopation
-- BPM {bpm} suggests {'mid-tempo rock' if 90 <= bpm <= 130 else 'fast rock energy' if bpm > 130 else 'ballad rock feel'}
-"""
-    
-    elif "jazz" in genre_lower:
-        return f"""
+""",
+    "jazz": """
 JAZZ GENRE GUIDELINES:
 - Use sophisticated harmony, swing rhythms, and complex chord progressions
 - Include syncopation, off-beat accents, and jazz-style phrasing
-- {layer} should incorporate jazz scales, blue notes, and chromatic passing tones
+- Every layer should incorporate jazz scales, blue notes, and chromatic passing tones
 - Focus on improvisation-friendly patterns and chord extensions
-- BPM {bpm} suggests {'swing ballad' if bpm < 90 else 'medium swing' if bpm <= 140 else 'bebop tempo'}
-"""
-    
-    elif "classical" in genre_lower:
-        return f"""
+""",
+    "classical": """
 CLASSICAL GENRE GUIDELINES:
 - Use traditional classical harmony, counterpoint, and form principles
 - Focus on melodic development, voice leading, and harmonic progression
-- {layer} should follow classical composition techniques and phrasing
+- Every layer should follow classical composition techniques and phrasing
 - Include proper voice leading and traditional classical rhythmic patterns
-- BPM {bpm} suggests {'andante/moderate' if 76 <= bpm <= 108 else 'allegro/fast' if bpm > 108 else 'adagio/slow'}
-"""
-    
-    elif "electronic" in genre_lower or "edm" in genre_lower:
-        return f"""
+""",
+    "electronic": """
 ELECTRONIC/EDM GENRE GUIDELINES:
 - Use repetitive patterns, build-ups, and electronic-style progressions
 - Focus on rhythmic precision, sequence-based patterns, and electronic textures
-- {layer} should incorporate electronic music elements like arpeggios or step sequences
+- Every layer should incorporate electronic music elements like arpeggios or step sequences
 - Include modern electronic rhythmic patterns and synthetic-friendly voicings
-- BPM {bpm} suggests {'downtempo electronic' if bpm < 100 else 'house/techno' if 120 <= bpm <= 135 else 'drum & bass/hardcore' if bpm > 140 else 'electronic'}
-"""
-    
-    elif "blues" in genre_lower:
-        return f"""
+""",
+    "blues": """
 BLUES GENRE GUIDELINES:
 - Use 12-bar blues progression, blue notes, and traditional blues scales
 - Focus on call-and-response patterns and blues-specific phrasing
-- {layer} should incorporate blues scales, bends (velocity variations), and blues rhythm
+- Every layer should incorporate blues scales, bends (velocity variations), and blues rhythm
 - Include characteristic blues rhythms like shuffle or straight blues feel
-- BPM {bpm} suggests {'slow blues' if bpm < 80 else 'medium blues' if bpm <= 120 else 'fast blues/boogie'}
-"""
-    
-    elif "folk" in genre_lower or "acoustic" in genre_lower:
-        return f"""
+""",
+    "folk": """
 FOLK/ACOUSTIC GENRE GUIDELINES:
 - Use simple, memorable melodies and traditional harmonic progressions
 - Focus on singable melodies, open chords, and acoustic instrument techniques
-- {layer} should be organic and natural-sounding with traditional phrasing
+- Every layer should be organic and natural-sounding with traditional phrasing
 - Include folk-style strumming patterns or fingerpicking elements
-- BPM {bpm} suggests {'ballad folk' if bpm < 90 else 'moderate folk' if bpm <= 120 else 'uptempo folk/country'}
-"""
-    
-    elif "latin" in genre_lower or "salsa" in genre_lower or "bossa" in genre_lower:
-        return f"""
+""",
+    "latin": """
 LATIN GENRE GUIDELINES:
 - Use Latin rhythms like clave, montuno, or bossa nova patterns
 - Focus on syncopated rhythms, Latin percussion, and characteristic chord progressions
-- {layer} should incorporate Latin-style phrasing and rhythmic complexity
+- Every layer should incorporate Latin-style phrasing and rhythmic complexity
 - Include traditional Latin harmonic progressions and rhythmic patterns
-- BPM {bpm} suggests {'bossa nova' if 100 <= bpm <= 130 else 'salsa/mambo' if 150 <= bpm <= 200 else 'Latin style'}
-"""
-    
-    elif "country" in genre_lower:
-        return f"""
+""",
+    "country": """
 COUNTRY GENRE GUIDELINES:
 - Use simple chord progressions, storytelling melodies, and country-style phrasing
 - Focus on traditional country instruments and playing techniques
-- {layer} should incorporate country-style licks, bends, and rhythmic feel
+- Every layer should incorporate country-style licks, bends, and rhythmic feel
 - Include characteristic country rhythms and harmonic progressions
-- BPM {bpm} suggests {'country ballad' if bpm < 90 else 'country shuffle' if 90 <= bpm <= 130 else 'country rock/honky-tonk'}
-"""
-    
-    else:  # general/default
-        return f"""
+""",
+    "general": """
 GENERAL MUSICAL GUIDELINES:
 - Create musically coherent patterns that fit the specified style
 - Focus on appropriate harmonic progressions and melodic development for the genre
-- {layer} should be well-structured with clear musical phrasing
+- Every layer should be well-structured with clear musical phrasing
 - Use rhythmic patterns and dynamics appropriate for the musical context
-- BPM {bpm} creates a {'relaxed' if bpm < 90 else 'moderate' if bpm <= 130 else 'energetic'} feel
-"""
\ No newline at end of file
+""",
+}
+
+# Ordered (family, keywords) rules for genre names
+GENRE_FAMILY_KEYWORDS = (
+    ("rock", ("rock",)),
+    ("jazz", ("jazz",)),
+    ("classical", ("classical",)),
+    ("electronic", ("electronic", "edm")),
+    ("blues", ("blues",)),
+    ("folk", ("folk", "acoustic")),
+    ("latin", ("latin", "salsa", "bossa")),
+    ("country", ("country",)),
+)
+
+# What a tempo suggests in each genre
+GENRE_TEMPO_FEEL = {
+    "rock": lambda bpm: "mid-tempo rock" if 90 <= bpm <= 130 else "fast rock energy" if bpm > 130 else "ballad rock feel",
+    "jazz": lambda bpm: "swing ballad" if bpm < 90 else "medium swing" if bpm <= 140 else "bebop tempo",
+    "classical": lambda bpm: "andante/moderate" if 76 <= bpm <= 108 else "allegro/fast" if bpm > 108 else "adagio/slow",
+    "electronic": lambda bpm: "downtempo electronic" if bpm < 100 else "house/techno" if 120 <= bpm <= 135 else "drum & bass/hardcore" if bpm > 140 else "electronic",
+    "blues": lambda bpm: "slow blues" if bpm < 80 else "medium blues" if bpm <= 120 else "fast blues/boogie",
+    "folk": lambda bpm: "ballad folk" if bpm < 90 else "moderate folk" if bpm <= 120 else "uptempo folk/country",
+    "latin": lambda bpm: "bossa nova" if 100 <= bpm <= 130 else "salsa/mambo" if 150 <= bpm <= 200 else "Latin style",
+    "country": lambda bpm: "country ballad" if bpm < 90 else "country shuffle" if 90 <= bpm <= 130 else "country rock/honky-tonk",
+    "general": lambda bpm: "a relaxed feel" if bpm < 90 else "a moderate feel" if bpm <= 130 else "an energetic feel",
+}
+
+# Output instructions for the JSON pattern format
+JSON_FORMAT_INSTRUCTIONS = """
+Return ONLY valid JSON in this format, with "metadata" echoing the request:
+{
+  "metadata": {
+    "layer": "melody",
+    "bpm": 120,
+    "key": "C minor",
+    "bars": 8,
+    "instrument": "piano",
+    "genre": "general"
+  },
+  "pattern": [
+    {
+      "note": 55,
+      "velocity": 90,
+      "duration": 480,
+      "bar": 1,
+      "beat": 1.0
+    },
+    {
+      "note": 58,
+      "velocity": 90,
+      "duration": 480,
+      "bar": 1,
+      "beat": 1.0
+    }
+  ]
+}
+
+For repeated material, declare motifs once and place them instead of writing out every bar:
+  "motifs": {"A": [{"note": 60, "velocity": 90, "duration": 240, "bar": 1, "beat": 1.0}]},
+  "structure": [
+    {"motif": "A", "bars": [1, 5]},
+    {"motif": "A", "start": 9, "times": 4, "transpose": 5, "variation": "invert"}
+  ]
+Motif bars count from 1. "bars" lists start bars; "start" + "times" repeats back to back.
+"transpose" shifts by semitones, "velocity" is added to every note, and "variation" is any of
+"invert", "retrograde" or "sparse". Placed motifs are added to the notes in "pattern".
+"""
+
+# Output instructions for the compact pattern format (see ai.pattern_parser.CompactPatternParser)
+COMPACT_FORMAT_INSTRUCTIONS = """
+Return ONLY the pattern in this compact format, with no prose and no JSON:
+note,velocity,duration,bar,beat
+55,90,480,1,1
+58,90,480,1,1
+
+One row per note: MIDI note number, velocity (1-127), duration in ticks (480 = quarter note),
+bar (from 1) and beat (from 1, may be fractional). Rows may be in any order; notes sharing a
+bar and beat sound together.
+
+Write repeated material once as a motif and place it with @repeat instead of spelling it out:
+@motif A
+60,90,240,1,1
+62,90,240,1,2
+@end
+@repeat A 1 3 5 7
+
+Inside a motif, bars count from 1; @repeat A 3 plays the motif's bar 1 at bar 3.
+A motif is only heard where it is repeated. A repeat can change it:
+@repeat A 9 transpose=5 velocity=-10 variation=invert
+transpose shifts by semitones, velocity is added to every note, and variation is any of
+invert, retrograde or sparse (comma-separated).
+"""
+
+FORMAT_INSTRUCTIONS = {"json": JSON_FORMAT_INSTRUCTIONS, "compact": COMPACT_FORMAT_INSTRUCTIONS}
+
+@lru_cache(maxsize=None)
+def build_system_prompt(pattern_format: str = "json") -> str:
+    """The static part of every prompt: role, all guidance tables and the output format.
+
+    It only depends on PROMPT_VERSION and the format, so requests share it as a cacheable prefix.
+    """
+    return "".join([
+        f"You are an expert music pattern composer (prompt v{PROMPT_VERSION}).\n",
+        "Each request names a layer, instrument, key, tempo, length and genre. Focus on musical coherence\n",
+        "and playability for that instrument and genre, following the guidelines the request points to.\n",
+        "\n=== INSTRUMENT GUIDELINES ===\n",
+        *INSTRUMENT_GUIDANCE.values(),
+        "\n=== GENRE GUIDELINES ===\n",
+        *GENRE_GUIDANCE.values(),
+        "\n=== OUTPUT FORMAT ===\n",
+        FORMAT_INSTRUCTIONS[pattern_format],
+        "\n------\nweirdness: 50%\nvariability: 70%\n",
+    ])
+
+@lru_cache(maxsize=1024)
+def build_request(layer: str, key: str, bpm: int, bars: int, instrument: str = "piano", genre: str = "general", context: str = "") -> str:
+    """The variable part of a prompt: the request itself, pointing at the guidance it should follow."""
+    family = genre_family(genre)
+    instrument_title = INSTRUMENT_GUIDANCE[instrument_family(layer, instrument)].strip().splitlines()[0].rstrip(":")
+    genre_title = GENRE_GUIDANCE[family].strip().splitlines()[0].rstrip(":")
+    return f"""Generate a {bars}-bar {layer} pattern for {instrument} in {key} at {bpm} BPM in {genre} style.
+Follow the {instrument_title} and the {genre_title}; {bpm} BPM suggests {GENRE_TEMPO_FEEL[family](bpm)}.
+""" + context
+
+def build_messages(layer: str, key: str, bpm: int, bars: int, instrument: str = "piano", genre: str = "general",
+                   pattern_format: str = "json", context: str = "") -> List[dict]:
+    """Chat messages for a pattern request: the static system prompt first, the variable request last.
+
+    `context` is appended to the request (see build_section_context). Both parts are rendered once
+    and cached, so repeated requests only build the message list.
+    """
+    return [
+        {"role": "system", "content": build_system_prompt(pattern_format)},
+        {"role": "user", "content": build_request(layer, key, bpm, bars, instrument, genre, context)},
+    ]
+
+def build_prompt(layer: str, key: str, bpm: int, bars: int, instrument: str = "piano", genre: str = "general", pattern_format: str = "json") -> str:
+    """Construct the full instruction prompt as a single string (the messages of build_messages, joined)."""
+    return "\n".join(message["content"] for message in build_messages(layer, key, bpm, bars, instrument, genre, pattern_format))
+
+def count_tokens(text: str) -> int:
+    """Count tokens with tiktoken when it's installed, otherwise estimate about four characters per token."""
+    try:
+        import tiktoken
+    except ImportError:
+        return (len(text) + 3) // 4
+    return len(tiktoken.get_encoding("o200k_base").encode(text))
+
+def prompt_info(messages: List[dict]) -> dict:
+    """Describe a prompt's layout: version, hash and size of the static prefix, and total size."""
+    prefix = messages[0]["content"]
+    return {
+        "version": PROMPT_VERSION,
+        "prefix_hash": hashlib.sha256(prefix.encode("utf-8")).hexdigest()[:16],
+        "prefix_tokens": count_tokens(prefix),
+        "total_tokens": sum(count_tokens(message["content"]) for message in messages),
+    }
+
+def build_section_context(index: int, count: int, start_bar: int, bars: int, total_bars: int, seed: str = "") -> str:
+    """Describe where a section sits in a longer piece; appended to the request for that section."""
+    end_bar = start_bar + bars - 1
+    context = f"""
+This is section {index + 1} of {count} of a {total_bars}-bar piece, covering bars {start_bar}-{end_bar}.
+Write only this section's {bars} bars, numbering them from bar 1.
+"""
+    if index == 0:
+        context += "It opens the piece, so establish the main ideas that later sections will develop.\n"
+    elif seed:
+        context += f"""Continue naturally from the opening section, which ended with these notes
+(note,velocity,duration,bar,beat with bars counted within that section):
+{seed}
+"""
+    if index == count - 1 and count > 1:
+        context += "It ends the piece, so finish with a clear resolution.\n"
+    return context
+
+@lru_cache(maxsize=1024)
+def instrument_family(layer: str, instrument: str) -> str:
+    """Pick the INSTRUMENT_GUIDANCE entry for an instrument name or GM program number."""
+    name = normalize_instrument_name(instrument)
+    if name.isdigit() and int(name) < len(PROGRAM_FAMILIES):
+        family = PROGRAM_FAMILIES[int(name)]
+    elif name in INSTRUMENT_FAMILIES:
+        family = INSTRUMENT_FAMILIES[name]
+    else:
+        family = _match_family(name, INSTRUMENT_FAMILY_KEYWORDS)
+    return "drums" if family == "general" and layer == "drums" else family
+
+@lru_cache(maxsize=256)
+def genre_family(genre: str) -> str:
+    """Pick the GENRE_GUIDANCE entry for a genre name."""
+    return _match_family(genre.lower().replace("_", " ").replace("-", " "), GENRE_FAMILY_KEYWORDS)
+
+def get_instrument_guidance(layer: str, instrument: str) -> str:
+    """Get instrument-specific composition guidance."""
+    return INSTRUMENT_GUIDANCE[instrument_family(layer, instrument)]
+
+def get_genre_guidance(genre: str, layer: str, bpm: int) -> str:
+    """Get genre-specific composition guidance, including the feel the tempo suggests."""
+    family = genre_family(genre)
+    return GENRE_GUIDANCE[family] + f"- BPM {bpm} suggests {GENRE_TEMPO_FEEL[family](bpm)} for the {layer}\n"
@@ -0,0 +1,165 @@
+import asyncio
+import inspect
+import os
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Awaitable, Callable, Optional, TypeVar
+
+T = TypeVar("T")
+
+MAX_RETRIES = int(os.getenv("CONDUCTIO_OPENAI_MAX_RETRIES", "3"))
+RETRY_BASE_DELAY = float(os.getenv("CONDUCTIO_OPENAI_RETRY_BASE_DELAY", "0.5"))
+RETRY_MAX_DELAY = float(os.getenv("CONDUCTIO_OPENAI_RETRY_MAX_DELAY", "20"))
+
+# Send a duplicate request once the first has taken longer than this latency percentile (0 disables)
+HEDGE_PERCENTILE = float(os.getenv("CONDUCTIO_OPENAI_HEDGE_PERCENTILE", "0"))
+HEDGE_MIN_SAMPLES = int(os.getenv("CONDUCTIO_OPENAI_HEDGE_MIN_SAMPLES", "10"))
+
+class LatencyTracker:
+    """Rolling window of successful request latencies used to decide when to hedge."""
+
+    def __init__(self, window: int = 200):
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def hedge_after(self, percentile: Optional[float] = None, min_samples: Optional[int] = None) -> Optional[float]:
+        """Latency after which a hedged request should be sent, or None if hedging is off or there's too little data."""
+        percentile = HEDGE_PERCENTILE if percentile is None else percentile
+        min_samples = HEDGE_MIN_SAMPLES if min_samples is None else min_samples
+        with self._lock:
+            if percentile <= 0 or len(self._samples) < min_samples:
+                return None
+            samples = sorted(self._samples)
+        index = min(len(samples) - 1, int(len(samples) * percentile / 100.0))
+        return samples[index]
+
+latency_tracker = LatencyTracker()
+# Streaming calls return once the stream opens, so their latencies (time to first byte) are kept apart
+stream_latency_tracker = LatencyTracker()
+
+# Hedged duplicates run on this pool so the caller can wait on whichever finishes first
+_hedge_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="openai-hedge")
+
+def is_retryable(error: Exception) -> bool:
+    """Rate limits, server errors, timeouts and dropped connections are worth retrying."""
+    import openai
+    if isinstance(error, (openai.RateLimitError, openai.APIConnectionError)):
+        return True
+    return isinstance(error, openai.APIStatusError) and error.status_code >= 500
+
+def retry_delay(error: Exception, attempt: int) -> float:
+    """Full-jitter exponential backoff, honouring a Retry-After header when the server sends one."""
+    response = getattr(error, "response", None)
+    retry_after = response.headers.get("retry-after") if response is not None else None
+    if retry_after:
+        try:
+            return min(float(retry_after), RETRY_MAX_DELAY)
+        except ValueError:
+            pass
+    return random.uniform(0, min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** attempt))
+
+def _close_response(result):
+    # Streams hold a pooled connection until closed; plain completions have nothing to close
+    close = getattr(result, "close", None)
+    if close is not None:
+        outcome = close()
+        if inspect.isawaitable(outcome):
+            asyncio.ensure_future(outcome)
+
+def _discard(future):
+    """Close a losing hedged request's response whenever it arrives."""
+    future.add_done_callback(lambda done: done.cancelled() or done.exception() or _close_response(done.result()))
+
+def _call_hedged(call: Callable[[], T], tracker: LatencyTracker) -> T:
+    started = time.perf_counter()
+    hedge_after = tracker.hedge_after()
+    if hedge_after is None:
+        result = call()
+        tracker.record(time.perf_counter() - started)
+        return result
+
+    pending = {_hedge_executor.submit(call)}
+    done, _ = wait(pending, timeout=hedge_after)
+    if not done:
+        print(f"⏱️  No response after {hedge_after:.1f}s, sending a hedged duplicate request")
+        pending.add(_hedge_executor.submit(call))
+
+    error = None
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            if future.exception() is None:
+                tracker.record(time.perf_counter() - started)
+                for loser in (done | pending) - {future}:
+                    _discard(loser)
+                return future.result()
+            error = future.exception()
+    raise error
+
+def call_with_retries(call: Callable[[], T], max_retries: int = MAX_RETRIES, stream: bool = False) -> T:
+    """Run an API call with jittered exponential retries and optional request hedging.
+
+    Pass `stream` for calls that return an open stream, so they're timed against other streams.
+    """
+    tracker = stream_latency_tracker if stream else latency_tracker
+    for attempt in range(max_retries + 1):
+        try:
+            return _call_hedged(call, tracker)
+        except Exception as e:
+            if attempt >= max_retries or not is_retryable(e):
+                raise
+            delay = retry_delay(e, attempt)
+            print(f"⚠️  OpenAI request failed ({e.__class__.__name__}), retrying in {delay:.1f}s...")
+            time.sleep(delay)
+
+async def _acall_hedged(call: Callable[[], Awaitable[T]], tracker: LatencyTracker) -> T:
+    started = time.perf_counter()
+    hedge_after = tracker.hedge_after()
+    if hedge_after is None:
+        result = await call()
+        tracker.record(time.perf_counter() - started)
+        return result
+
+    pending = {asyncio.ensure_future(call())}
+    done, _ = await asyncio.wait(pending, timeout=hedge_after)
+    if not done:
+        print(f"⏱️  No response after {hedge_after:.1f}s, sending a hedged duplicate request")
+        pending.add(asyncio.ensure_future(call()))
+
+    error = None
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    tracker.record(time.perf_counter() - started)
+                    for loser in done - {task}:
+                        _discard(loser)
+                    return task.result()
+                error = task.exception()
+    finally:
+        # The losing request is no longer needed
+        for task in pending:
+            task.cancel()
+            _discard(task)
+    raise error
+
+async def acall_with_retries(call: Callable[[], Awaitable[T]], max_retries: int = MAX_RETRIES, stream: bool = False) -> T:
+    """Async version of call_with_retries."""
+    tracker = stream_latency_tracker if stream else latency_tracker
+    for attempt in range(max_retries + 1):
+        try:
+            return await _acall_hedged(call, tracker)
+        except Exception as e:
+            if attempt >= max_retries or not is_retryable(e):
+                raise
+            delay = retry_delay(e, attempt)
+            print(f"⚠️  OpenAI request failed ({e.__class__.__name__}), retrying in {delay:.1f}s...")
+            await asyncio.sleep(delay)
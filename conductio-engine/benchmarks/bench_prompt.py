@@ -0,0 +1,42 @@
+"""Microbenchmark for prompt construction.
+
+Run from conductio-engine/:  python benchmarks/bench_prompt.py
+"""
+import sys
+import timeit
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from ai import prompt_builder
+from ai.prompt_builder import build_messages, build_prompt
+
+# A spread of requests like the ones a warm worker sees
+REQUESTS = [
+    (layer, key, bpm, bars, instrument, genre)
+    for layer, instrument in [("melody", "violin"), ("bass", "fretless_bass"), ("drums", "piano"), ("chords", "electric_piano_1")]
+    for key in ["C minor", "F major"]
+    for bpm in [90, 128]
+    for bars in [8, 16]
+    for genre in ["jazz", "rock", "electronic"]
+]
+
+def clear_caches():
+    for function in (prompt_builder.build_system_prompt, prompt_builder.build_request,
+                     prompt_builder.instrument_family, prompt_builder.genre_family):
+        function.cache_clear()
+
+def run(label: str, function, number: int, cold: bool = False):
+    def body():
+        if cold:
+            clear_caches()
+        for request in REQUESTS:
+            function(*request)
+    seconds = min(timeit.repeat(body, number=number, repeat=5))
+    print(f"   {label:<34} {seconds / (number * len(REQUESTS)) * 1e6:8.2f} µs/request")
+
+if __name__ == "__main__":
+    print(f"⏱️  Prompt construction ({len(REQUESTS)} distinct requests)")
+    run("build_messages, cold caches", build_messages, 20, cold=True)
+    run("build_messages, warm caches", build_messages, 200)
+    run("build_prompt (joined string), warm", build_prompt, 200)
@@ -0,0 +1,98 @@
+"""Compare the streaming and note-sample render backends, and sequential and segmented rendering,
+for speed and fidelity.
+
+Needs FluidSynth and the FluidR3 soundfont (see DOCS.md, Soundfont Setup).
+
+Run from conductio-engine/:  python benchmarks/bench_render.py
+"""
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from generation import audio_renderer
+from generation.audio_renderer import AudioRenderer
+from generation.midi_builder import build_timeline
+
+BARS = 16
+
+def drum_pattern():
+    events = []
+    for bar in range(1, BARS + 1):
+        for eighth in range(8):
+            beat = 1 + eighth / 2
+            events.append({"note": 42, "velocity": 70 + 10 * (eighth % 2 == 0), "duration": 120, "bar": bar, "beat": beat})
+            if eighth in (0, 4):
+                events.append({"note": 36, "velocity": 110, "duration": 240, "bar": bar, "beat": beat})
+            if eighth in (2, 6):
+                events.append({"note": 38, "velocity": 100, "duration": 240, "bar": bar, "beat": beat})
+    return events
+
+def long_pattern(minutes: float = 5.0, bpm: int = 120):
+    """A busy melody plus sustained chords lasting `minutes`, for the segmented render comparison."""
+    bars = int(minutes * bpm / 4)
+    events = [{"note": 60 + (bar * 5 + step * 7) % 24, "velocity": 80 + step * 5, "duration": 240, "bar": bar, "beat": 1 + step / 2}
+              for bar in range(1, bars + 1) for step in range(8)]
+    events += [{"note": note, "velocity": 70, "duration": 1920 * 2, "bar": bar, "beat": 1.0}
+               for bar in range(1, bars + 1, 2) for note in (48, 55, 64)]
+    return events
+
+def melody_pattern():
+    phrase = [(60, 1.0, 480), (62, 2.0, 240), (64, 3.0, 240), (65, 4.0, 480), (67, 1.0, 480), (69, 2.0, 240), (67, 3.0, 240), (65, 4.0, 480)]
+    return [
+        {"note": note, "velocity": 85 + (index % 3) * 4, "duration": duration, "bar": bar + index // 4, "beat": beat}
+        for bar in range(1, BARS + 1, 2)
+        for index, (note, beat, duration) in enumerate(phrase)
+    ]
+
+def best_time(function, repeat: int = 3):
+    best, result = None, None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = function()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+def snr_db(reference: np.ndarray, other: np.ndarray) -> float:
+    length = min(len(reference), len(other))
+    noise = np.sum((reference[:length] - other[:length]) ** 2)
+    return float("inf") if noise == 0 else 10 * np.log10(np.sum(reference[:length] ** 2) / noise)
+
+if __name__ == "__main__":
+    stream = AudioRenderer(backend="stream")
+    if not Path(stream.soundfont_path).exists():
+        print(f"❌ Soundfont not found at {stream.soundfont_path}; this benchmark needs FluidSynth and FluidR3")
+        sys.exit(1)
+    samples = AudioRenderer(backend="samples")
+    stream.warm_up()
+
+    print(f"⏱️  Render backends ({BARS} bars at 120 BPM)")
+    for layer, events, program in [("drums", drum_pattern(), 0), ("melody", melody_pattern(), 0), ("bass", melody_pattern(), 33)]:
+        timeline = build_timeline(events, layer, program, 120)
+        stream_seconds, reference = best_time(lambda: stream._render_with_fluidsynth(timeline))
+
+        def cold():
+            audio_renderer.note_samples = audio_renderer.NoteSampleCache()
+            return samples._render_with_note_samples(timeline)
+        cold_seconds, _ = best_time(cold)
+        warm_seconds, rendered = best_time(lambda: samples._render_with_note_samples(timeline))
+
+        print(f"   {layer:<7} stream {stream_seconds * 1000:7.1f} ms | samples cold {cold_seconds * 1000:7.1f} ms "
+              f"({stream_seconds / cold_seconds:4.1f}x), warm {warm_seconds * 1000:7.1f} ms ({stream_seconds / warm_seconds:5.1f}x) "
+              f"| SNR {snr_db(reference, rendered):5.1f} dB")
+
+    # Segmented rendering of a long piece across processes against one sequential pass
+    minutes = 5.0
+    timeline = build_timeline(long_pattern(minutes), "melody", 0, 120)
+    audio_renderer.RENDER_SEGMENT_SECONDS = 0
+    sequential_seconds, reference = best_time(lambda: stream._render_with_fluidsynth(timeline), repeat=1)
+    audio_renderer.RENDER_SEGMENT_SECONDS = 20
+    stream._render_with_fluidsynth(timeline)  # start the segment workers and load their soundfonts
+    segmented_seconds, segmented = best_time(lambda: stream._render_with_fluidsynth(timeline), repeat=1)
+    print(f"⏱️  {minutes:g}-minute piece: sequential {sequential_seconds:6.2f} s | {audio_renderer.RENDER_PROCESSES} processes, "
+          f"{audio_renderer.RENDER_SEGMENT_SECONDS:g}s segments {segmented_seconds:6.2f} s ({sequential_seconds / segmented_seconds:4.1f}x) "
+          f"| SNR {snr_db(reference, segmented):5.1f} dB")
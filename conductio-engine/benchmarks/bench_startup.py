@@ -0,0 +1,76 @@
+"""Startup budget for lightweight CLI commands.
+
+Runs each command under `python -X importtime`, reports wall time and the cumulative import time
+of the modules it loaded, and exits non-zero if a command is over budget or pulls in a heavy
+dependency it shouldn't need.
+
+Run from conductio-engine/:  python benchmarks/bench_startup.py [--budget-ms 100]
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ENGINE_DIR = Path(__file__).resolve().parent.parent
+
+# Modules that only generation and rendering need
+HEAVY_MODULES = ("numpy", "openai", "httpx", "mido", "pretty_midi", "soundfile", "fluidsynth")
+
+def commands(tmpdir: str):
+    return [
+        ("--help", ["--help"]),
+        ("--list-instruments", ["--list-instruments"]),
+        ("--prompt-info", ["--prompt-info", "--layer", "bass", "--genre", "jazz"]),
+        ("--export-catalog", ["--export-catalog", os.path.join(tmpdir, "catalog.json")]),
+    ]
+
+def measure(args: list) -> tuple:
+    """Best-of-five wall time in ms, import time in ms and the set of top-level modules imported."""
+    best = None
+    for _ in range(5):
+        started = time.perf_counter()
+        result = subprocess.run([sys.executable, "-X", "importtime", "main.py", *args], cwd=ENGINE_DIR,
+                                capture_output=True, text=True)
+        elapsed = (time.perf_counter() - started) * 1000
+        if result.returncode != 0:
+            raise RuntimeError(f"main.py {' '.join(args)} failed:\n{result.stderr}")
+        if best is None or elapsed < best[0]:
+            best = (elapsed, result.stderr)
+
+    elapsed, report = best
+    import_us = 0
+    modules = set()
+    for line in report.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        # Top-level entries (no indentation) add up to the total import time
+        if not name.startswith("  "):
+            import_us += int(cumulative)
+        modules.add(name.strip().split(".")[0])
+    return elapsed, import_us / 1000, modules
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check startup time of lightweight commands")
+    parser.add_argument("--budget-ms", type=float, default=100, help="Maximum wall time per command")
+    args = parser.parse_args()
+
+    failures = []
+    print(f"⏱️  Startup time of lightweight commands (budget {args.budget_ms:.0f} ms)")
+    with tempfile.TemporaryDirectory() as tmpdir:
+        for label, command in commands(tmpdir):
+            elapsed, imports, modules = measure(command)
+            heavy = sorted(set(HEAVY_MODULES) & modules)
+            ok = elapsed <= args.budget_ms and not heavy
+            print(f"   {'✅' if ok else '❌'} {label:<20} {elapsed:7.1f} ms wall, {imports:6.1f} ms imports"
+                  + (f"  (loaded {', '.join(heavy)})" if heavy else ""))
+            if not ok:
+                failures.append(label)
+
+    if failures:
+        print(f"❌ Over budget: {', '.join(failures)}")
+        sys.exit(1)
+    print("✅ All commands within budget")
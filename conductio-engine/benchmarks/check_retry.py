@@ -0,0 +1,170 @@
+"""Check OpenAI retries and request hedging against a local stand-in server.
+
+Starts an HTTP server that speaks just enough of the chat completions API, points the engine's
+OpenAI client at it and checks that rate limits (429) and server errors (5xx) are retried, that
+Retry-After is honoured, that client errors are not retried, and that a slow request is hedged
+with the losing response (including a losing stream) closed. Needs no API key or network.
+
+Run from conductio-engine/:  python benchmarks/check_retry.py
+"""
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from ai import retry
+from ai.client import get_client
+
+class StandIn(BaseHTTPRequestHandler):
+    """Answers each request with the next scripted (status, delay, headers) step, then 200s."""
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        request = json.loads(self.rfile.read(int(self.headers["content-length"])))
+        server = self.server
+        with server.lock:
+            number = len(server.requests)
+            server.requests.append(time.perf_counter())
+        status, delay, headers = server.script[number] if number < len(server.script) else (200, 0, {})
+        time.sleep(delay)
+
+        if status != 200:
+            body = json.dumps({"error": {"message": f"scripted {status}", "type": "test"}}).encode()
+            self.send_response(status)
+            for name, value in headers.items():
+                self.send_header(name, value)
+            self.send_header("content-type", "application/json")
+            self.send_header("content-length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            return
+
+        content = json.dumps({"request": number})
+        if not request.get("stream"):
+            body = json.dumps({"id": "x", "object": "chat.completion", "created": 0, "model": "m", "choices": [
+                {"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": content}}]}).encode()
+            self.send_response(200)
+            self.send_header("content-type", "application/json")
+            self.send_header("content-length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            return
+
+        # Streams trickle out for a while; a client that closes early shows up as a broken pipe
+        self.send_response(200)
+        self.send_header("content-type", "text/event-stream")
+        self.end_headers()
+        try:
+            for _ in range(100):
+                chunk = {"id": "x", "object": "chat.completion.chunk", "created": 0, "model": "m",
+                         "choices": [{"index": 0, "delta": {"content": " "}, "finish_reason": None}]}
+                self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+                self.wfile.flush()
+                time.sleep(0.05)
+            self.wfile.write(b"data: [DONE]\n\n")
+        except (BrokenPipeError, ConnectionResetError):
+            with server.lock:
+                server.disconnects += 1
+
+def start_server() -> ThreadingHTTPServer:
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StandIn)
+    server.lock = threading.Lock()
+    server.requests, server.script, server.disconnects = [], [], 0
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def complete(client, stream: bool = False):
+    return retry.call_with_retries(lambda: client.chat.completions.create(
+        model="m", messages=[{"role": "user", "content": "hi"}], stream=stream), stream=stream)
+
+def check(label: str, ok: bool, detail: str, failures: list):
+    print(f"   {'✅' if ok else '❌'} {label:<34} {detail}")
+    if not ok:
+        failures.append(label)
+
+if __name__ == "__main__":
+    try:
+        import httpx, openai  # noqa: F401
+    except ImportError as e:
+        print(f"❌ {e.name} is not installed; this check needs the OpenAI SDK (see DOCS.md, Environment Setup)")
+        sys.exit(1)
+
+    server = start_server()
+    os.environ["OPENAI_BASE_URL"] = f"http://127.0.0.1:{server.server_port}/v1"
+    client = get_client("test-key")
+    retry.RETRY_BASE_DELAY = 0.05
+    failures = []
+
+    def run(script, **kwargs):
+        server.requests, server.script, server.disconnects = [], script, 0
+        retry.latency_tracker = retry.LatencyTracker()
+        started = time.perf_counter()
+        try:
+            result = complete(client, **kwargs)
+        except Exception as e:
+            result = e
+        return result, time.perf_counter() - started
+
+    print("🔁 OpenAI retries and hedging against a local stand-in server")
+
+    result, elapsed = run([(429, 0, {}), (503, 0, {}), (500, 0, {})])
+    check("429/503/500 are retried", not isinstance(result, Exception) and len(server.requests) == 4,
+          f"{len(server.requests)} requests, {elapsed:.2f}s", failures)
+
+    result, elapsed = run([(429, 0, {"retry-after": "1"})])
+    check("Retry-After is honoured", len(server.requests) == 2 and elapsed >= 1.0,
+          f"waited {elapsed:.2f}s for retry-after: 1", failures)
+
+    result, elapsed = run([(400, 0, {})])
+    check("400 is not retried", isinstance(result, Exception) and len(server.requests) == 1,
+          f"{len(server.requests)} request, {result.__class__.__name__}", failures)
+
+    result, elapsed = run([(503, 0, {})] * 10)
+    check("retries stop after MAX_RETRIES", isinstance(result, Exception) and len(server.requests) == retry.MAX_RETRIES + 1,
+          f"{len(server.requests)} requests", failures)
+
+    # Streams report time to first byte, which mustn't drag down the completion latencies used for hedging
+    retry.stream_latency_tracker = retry.LatencyTracker()
+    result, elapsed = run([], stream=True)
+    result.close()
+    check("streams are timed separately", retry.latency_tracker.hedge_after(50, 1) is None
+          and retry.stream_latency_tracker.hedge_after(50, 1) is not None,
+          "completion tracker untouched by a stream", failures)
+
+    # Hedging: with a history of 0.2s responses, a request still running at the 90th percentile is duplicated
+    retry.HEDGE_PERCENTILE = 90
+    for stream in (False, True):
+        server.requests, server.script, server.disconnects = [], [(200, 2.0, {})], 0
+        tracker = retry.LatencyTracker()
+        for _ in range(retry.HEDGE_MIN_SAMPLES):
+            tracker.record(0.2)
+        if stream:
+            retry.stream_latency_tracker = tracker
+        else:
+            retry.latency_tracker = tracker
+        started = time.perf_counter()
+        response = complete(client, stream=stream)
+        elapsed = time.perf_counter() - started
+        if stream:
+            response.close()
+            time.sleep(2.5)  # the slow first request opens its stream, which should be closed right away
+        kind = "stream" if stream else "completion"
+        check(f"slow {kind} is hedged", len(server.requests) == 2 and elapsed < 1.5,
+              f"{len(server.requests)} requests, answered in {elapsed:.2f}s", failures)
+        if stream:
+            check("losing stream is closed", server.disconnects == 2,
+                  f"{server.disconnects} of 2 streams closed early", failures)
+    retry.HEDGE_PERCENTILE = 0
+
+    server.shutdown()
+    if failures:
+        print(f"❌ Failed: {', '.join(failures)}")
+        sys.exit(1)
+    print("✅ Retries and hedging behave as expected")
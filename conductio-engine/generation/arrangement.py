@@ -0,0 +1,154 @@
+import json
+import multiprocessing
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+from ai.prompt_builder import build_messages
+from ai.client import generate_patterns
+from ai.pattern_parser import validate_pattern
+from generation.midi_builder import Timeline, build_timeline, write_arrangement_midi
+from generation.layer_runner import generate_creative_name, resolve_instrument
+
+LAYER_TYPES = ["melody", "bass", "drums", "chords"]
+
+# Render workers are started once and reused, so each keeps its own warm synth pool between arrangements
+_render_pool: Optional[ProcessPoolExecutor] = None
+
+def _init_render_worker(quiet_stdout: bool):
+    # In worker mode stdout is the JSON protocol channel, so progress output must go to stderr
+    if quiet_stdout:
+        sys.stdout = sys.stderr
+
+def _get_render_pool() -> ProcessPoolExecutor:
+    global _render_pool
+    if _render_pool is None:
+        # "spawn" so workers never inherit FluidSynth state from a warm parent process
+        _render_pool = ProcessPoolExecutor(
+            max_workers=min(len(LAYER_TYPES), os.cpu_count() or 1),
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_render_worker,
+            initargs=(sys.stdout is not sys.__stdout__,),
+        )
+    return _render_pool
+
+def _render_stem(timeline: Timeline, output_dir: Path, audio_format: str = "wav") -> Optional[str]:
+    """Render (and encode) one layer's stem inside a render worker process."""
+    from generation.audio_renderer import render_audio
+    from generation.encoder import encode_audio, format_sample_rate
+    wav_path = render_audio(timeline, output_dir, timeline.layer_type, timeline.program, sample_rate=format_sample_rate(audio_format))
+    audio_path = encode_audio(wav_path, audio_format) if wav_path else None
+    return str(audio_path) if audio_path else None
+
+def _render_mix(timelines: List[Timeline], output_dir: Path, audio_format: str = "wav") -> Optional[str]:
+    """Render every layer into one mix, in a single synth pass, and encode it inside a render worker process."""
+    from generation.audio_renderer import render_mix
+    from generation.encoder import encode_audio, format_sample_rate
+    wav_path = render_mix(timelines, output_dir, sample_rate=format_sample_rate(audio_format))
+    audio_path = encode_audio(wav_path, audio_format) if wav_path else None
+    return str(audio_path) if audio_path else None
+
+def parse_arrangement(spec: str) -> List[Tuple[str, str]]:
+    """Parse "melody:violin,bass,drums" into [("melody", "violin"), ("bass", "auto"), ("drums", "auto")].
+
+    Raises:
+        ValueError: If a layer is unknown or listed twice
+    """
+    layers = []
+    for item in spec.split(","):
+        layer, _, instrument = item.strip().partition(":")
+        layer = layer.strip().lower()
+        if layer not in LAYER_TYPES:
+            raise ValueError(f"Unknown layer '{layer}'. Layers must be one of: {', '.join(LAYER_TYPES)}")
+        if layer in [existing for existing, _ in layers]:
+            raise ValueError(f"Layer '{layer}' is listed more than once")
+        layers.append((layer, instrument.strip() or "auto"))
+    return layers
+
+def run_arrangement(layers: List[Tuple[str, str]], key: str, bpm: int, bars: int, render_audio_flag: bool = True, genre: str = "general", pattern_format: str = "json",
+                    stems: bool = False, audio_format: str = "wav") -> Optional[dict]:
+    """Generate several layers as one arrangement.
+
+    All patterns are requested from the model concurrently. The audio is one mix rendered in a
+    single synth pass, with every layer on its own MIDI channel. With `stems`, each layer is also
+    rendered to its own WAV; those renders run in parallel worker processes alongside the mix.
+    A compressed `audio_format` ("flac", "ogg", "opus") is encoded in those workers as each render finishes.
+    Returns a dict describing the generated package, or None if an instrument could not be resolved.
+    """
+    # Resolve instruments
+    resolved = []
+    for layer, instrument in layers:
+        try:
+            program, name = resolve_instrument(layer, instrument)
+        except ValueError as e:
+            print(f"❌ {e}")
+            return
+        resolved.append((layer, program, name))
+
+    requests = [
+        {
+            "prompt": build_messages(layer, key, bpm, bars, name if name != "default" else "piano", genre, pattern_format),
+            "format": pattern_format,
+            "layer": layer, "key": key, "bpm": bpm, "bars": bars,
+        }
+        for layer, _, name in resolved
+    ]
+    print(f"🧠 Generating {len(requests)} layers concurrently with GPT-5-mini…")
+    patterns = [validate_pattern(ai_data) for ai_data in generate_patterns(requests)]
+
+    # session folder with creative naming
+    creative_name = generate_creative_name()
+    outdir = Path("output") / f"{creative_name}_arrangement.mcpkg"
+    outdir.mkdir(parents=True, exist_ok=True)
+
+    # save all layer patterns in one document
+    document = {
+        "metadata": {"layers": [layer for layer, _, _ in resolved], "bpm": bpm, "key": key, "bars": bars, "genre": genre},
+        "layers": {layer: pattern.to_dict() for (layer, _, _), pattern in zip(resolved, patterns)},
+    }
+    json.dump(document, open(outdir / "pattern.json", "w"), indent=2)
+
+    timelines = [build_timeline(pattern, layer, program, bpm) for (layer, program, _), pattern in zip(resolved, patterns)]
+
+    # Audio renders in worker processes while the combined MIDI is written here
+    mix_future = None
+    stem_futures = []
+    if render_audio_flag:
+        pool = _get_render_pool()
+        mix_future = pool.submit(_render_mix, timelines, outdir, audio_format)
+        if stems:
+            stem_futures = [pool.submit(_render_stem, timeline, outdir, audio_format) for timeline in timelines]
+
+    midi_path = outdir / "arrangement.mid"
+    write_arrangement_midi(timelines, midi_path)
+    print(f"✅ Saved arrangement MIDI to {midi_path}")
+
+    mix = None
+    if mix_future:
+        try:
+            mix = mix_future.result()
+        except Exception as e:
+            print(f"❌ Failed to render the mix: {e}")
+
+    stem_paths = {layer: None for layer, _, _ in resolved}
+    for (layer, _, _), future in zip(resolved, stem_futures):
+        try:
+            stem_paths[layer] = future.result()
+        except Exception as e:
+            print(f"❌ Failed to render audio for {layer}: {e}")
+
+    if render_audio_flag:
+        if mix and (not stems or all(stem_paths.values())):
+            print(f"🎶 Audio rendering complete!")
+        else:
+            print(f"⚠️  Some audio failed to render, MIDI file still available")
+
+    return {
+        "output_path": str(outdir),
+        "pattern_file": str(outdir / "pattern.json"),
+        "midi_file": str(midi_path),
+        "mix": mix,
+        "stems": stem_paths,
+    }
@@ -1,137 +1,591 @@
+import multiprocessing
 import os
+import queue
+import sys
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
 from pathlib import Path
 import pretty_midi
 import soundfile as sf
 import numpy as np
 import fluidsynth
-from typing import Optional
+from typing import Callable, Dict, Iterator, List, Optional, Tuple, Union
+from ai.cache import temp_path
+from generation.audio_stream import WavChunkStream
+from generation.midi_builder import NOTE_DTYPE, TICKS_PER_BEAT, Timeline, assign_channels
+from generation.render_cache import get_render_cache
+
+# Part of every render cache key; bump whenever a change to rendering alters the audio it produces
+RENDERER_VERSION = "2"
+
+# Synths per pool unless overridden by AudioRenderer(pool_size=...)
+DEFAULT_SYNTH_POOL_SIZE = int(os.getenv("CONDUCTIO_SYNTH_POOL_SIZE", "2"))
+
+# Frames rendered per FluidSynth call in the block render loop
+RENDER_BLOCK_SIZE = 4096
+
+# "stream" plays every event through FluidSynth; "samples" renders each distinct note once and mixes copies of it
+RENDER_BACKENDS = ("stream", "samples")
+DEFAULT_RENDER_BACKEND = os.getenv("CONDUCTIO_RENDER_BACKEND", "stream")
+
+# Note-sample backend: velocities are rendered in steps of this size and gain-corrected to the exact value
+NOTE_VELOCITY_STEP = 8
+# Release tails are rendered until they fall to this level (16-bit sample units) or this many seconds
+NOTE_TAIL_THRESHOLD = 4
+NOTE_TAIL_MAX_SECONDS = 3.0
+NOTE_CACHE_MAX_BYTES = int(float(os.getenv("CONDUCTIO_NOTE_CACHE_MAX_MB", "256")) * 1024 * 1024)
+
+# Streaming renders longer than one segment are split into segments of this length and rendered in
+# parallel processes (0 renders sequentially). Each segment pre-rolls from far enough back to catch the
+# notes and release tails still sounding at its start, and overlaps its neighbour by a short crossfade.
+RENDER_SEGMENT_SECONDS = float(os.getenv("CONDUCTIO_RENDER_SEGMENT_SECONDS", "0"))
+RENDER_PROCESSES = int(os.getenv("CONDUCTIO_RENDER_PROCESSES", str(os.cpu_count() or 1)))
+RENDER_PREROLL_SECONDS = NOTE_TAIL_MAX_SECONDS
+RENDER_CROSSFADE_SECONDS = 0.05
+
+class SynthPool:
+    """Pool of FluidSynth instances that load the soundfont once and are reused across renders."""
+    
+    def __init__(self, soundfont_path: str, sample_rate: int, size: int = DEFAULT_SYNTH_POOL_SIZE):
+        self.soundfont_path = soundfont_path
+        self.sample_rate = sample_rate
+        self.size = max(1, size)
+        self._idle = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+    
+    def _create(self) -> Tuple[fluidsynth.Synth, int]:
+        fs = fluidsynth.Synth(samplerate=self.sample_rate)
+        sfid = fs.sfload(self.soundfont_path)
+        if sfid == -1:
+            fs.delete()
+            raise Exception("Failed to load FluidR3 soundfont")
+        return fs, sfid
+    
+    def _reserve_slot(self) -> bool:
+        with self._lock:
+            if self._created < self.size:
+                self._created += 1
+                return True
+            return False
+    
+    def _new_synth(self) -> Tuple[fluidsynth.Synth, int]:
+        try:
+            return self._create()
+        except Exception:
+            with self._lock:
+                self._created -= 1
+            raise
+    
+    def warm(self, count: Optional[int] = None):
+        """Pre-load up to `count` synths (default: the whole pool) so the first renders don't pay for sfload."""
+        for _ in range((count or self.size)):
+            if not self._reserve_slot():
+                break
+            self._idle.put(self._new_synth())
+    
+    def acquire(self, timeout: Optional[float] = None) -> Tuple[fluidsynth.Synth, int]:
+        """Check out a synth, creating one if the pool isn't full yet, and reset it to a clean state."""
+        try:
+            synth = self._idle.get_nowait()
+        except queue.Empty:
+            if self._reserve_slot():
+                synth = self._new_synth()
+            else:
+                synth = self._idle.get(timeout=timeout)
+        
+        self._reset(synth[0])
+        return synth
+    
+    def release(self, synth: Tuple[fluidsynth.Synth, int]):
+        """Return a synth to the pool."""
+        self._idle.put(synth)
+    
+    @contextmanager
+    def synth(self, timeout: Optional[float] = None):
+        """Context manager yielding a checked-out (synth, soundfont id) pair."""
+        synth = self.acquire(timeout)
+        try:
+            yield synth
+        finally:
+            self.release(synth)
+    
+    @staticmethod
+    def _reset(fs: fluidsynth.Synth):
+        """Return a synth to its freshly loaded state.
+        
+        A system reset kills every voice, resets controllers and programs, and clears the reverb and
+        chorus buffers, so no tail of the previous render leaks into the next. Renders select their
+        programs again after checking a synth out (see _setup_fluidsynth_instruments).
+        """
+        fs.system_reset()
+
+class NoteSampleCache:
+    """In-memory LRU cache of single rendered notes (stereo float32 arrays) for the "samples" backend."""
+    
+    def __init__(self, max_bytes: int = NOTE_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._samples = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+    
+    def get(self, key: tuple) -> Optional[np.ndarray]:
+        with self._lock:
+            sample = self._samples.get(key)
+            if sample is not None:
+                self._samples.move_to_end(key)
+            return sample
+    
+    def put(self, key: tuple, sample: np.ndarray):
+        with self._lock:
+            if key in self._samples:
+                return
+            self._samples[key] = sample
+            self._bytes += sample.nbytes
+            while self._bytes > self.max_bytes and len(self._samples) > 1:
+                _, evicted = self._samples.popitem(last=False)
+                self._bytes -= evicted.nbytes
+
+note_samples = NoteSampleCache()
+
+_synth_pools: Dict[Tuple[str, int], SynthPool] = {}
+_synth_pools_lock = threading.Lock()
+
+def get_synth_pool(soundfont_path: str, sample_rate: int, size: Optional[int] = None) -> SynthPool:
+    """Return the process-wide synth pool for a soundfont and sample rate."""
+    with _synth_pools_lock:
+        pool = _synth_pools.get((soundfont_path, sample_rate))
+        if pool is None:
+            pool = SynthPool(soundfont_path, sample_rate, size or DEFAULT_SYNTH_POOL_SIZE)
+            _synth_pools[(soundfont_path, sample_rate)] = pool
+        return pool
 
 class AudioRenderer:
     """Renders MIDI files to WAV using FluidR3 soundfont."""
     
-    def __init__(self, sample_rate: int = 44100, force_fluidsynth_drums: bool = False):
+    def __init__(self, sample_rate: int = 44100, force_fluidsynth_drums: bool = False, pool_size: Optional[int] = None,
+                 backend: str = DEFAULT_RENDER_BACKEND):
+        if backend not in RENDER_BACKENDS:
+            raise ValueError(f"Render backend must be one of: {', '.join(RENDER_BACKENDS)}")
         self.sample_rate = sample_rate
+        self.backend = backend
         self.force_fluidsynth_drums = force_fluidsynth_drums
         # Use the FluidR3 soundfont
         self.soundfont_path = "soundfonts/FluidR3_GM/FluidR3_GM.sf2"
+        # Shared pool of synths with the soundfont already loaded
+        self.synth_pool = get_synth_pool(self.soundfont_path, self.sample_rate, pool_size)
+    
+    def warm_up(self) -> bool:
+        """Load the soundfont ahead of the first render. Returns True if FluidSynth is ready.
         
-    def render_midi_to_wav(self, midi_path: Path, output_path: Path, layer_type: str = "melody", instrument_program: int = 0) -> bool:
-        """Render a MIDI file to WAV audio using FluidSynth with FluidR3."""
+        Only one synth is loaded; each holds its own copy of the soundfont, so further ones are
+        created only when renders actually overlap.
+        """
+        if not Path(self.soundfont_path).exists():
+            return False
+        self.synth_pool.warm(1)
+        return True
+        
+    def render_timeline_to_wav(self, timeline: Timeline, output_path: Path, on_chunk: Optional[Callable[[bytes], None]] = None) -> bool:
+        """Render an in-memory Timeline to WAV audio using FluidSynth with FluidR3.
+        
+        Identical renders are served from the render cache instead of being synthesized again.
+        """
+        return self.render_mix_to_wav([timeline], output_path, on_chunk)
+    
+    def render_mix_to_wav(self, timelines: List[Timeline], output_path: Path, on_chunk: Optional[Callable[[bytes], None]] = None) -> bool:
+        """Render several layer timelines, mixed, into one WAV file in a single synth pass.
+        
+        Each layer plays on its own MIDI channel and program (see assign_channels) of one pooled synth.
+        With `on_chunk`, the audio is also passed on as a progressive WAV stream (see WavChunkStream)
+        while it renders. Streamed renders go out at the synth's own level, before the file is normalized.
+        """
+        stream = WavChunkStream(on_chunk, self.sample_rate) if on_chunk else None
         try:
+            use_fluidsynth = Path(self.soundfont_path).exists()
+            cache = get_render_cache()
+            backend = f"fluidsynth-{self.backend}:{self.soundfont_path}" if use_fluidsynth else "pretty_midi"
+            if use_fluidsynth and self.backend == "stream" and self._segmented(timelines):
+                # Segment seams come out slightly differently from a sequential render
+                backend += f":segments-{RENDER_SEGMENT_SECONDS:g}"
+            cache_key = cache.make_key(timelines, self.sample_rate, backend, RENDERER_VERSION)
+            if cache.fetch(cache_key, Path(output_path)):
+                print("⚡ Using cached render")
+                if stream:
+                    stream.write_file(Path(output_path))
+                    stream.close()
+                return True
+            
             # Try FluidSynth with soundfont first, fall back to pretty_midi if needed
-            if Path(self.soundfont_path).exists():
-                # Always try FluidSynth first, but with better drum handling
-                audio = self._render_with_fluidsynth(midi_path, layer_type, instrument_program)
+            cacheable = True
+            audio = None
+            if use_fluidsynth:
+                try:
+                    if self.backend == "samples":
+                        audio = self._render_with_note_samples(timelines)
+                    elif self._segmented(timelines):
+                        audio = self._render_with_fluidsynth(timelines)
+                    else:
+                        # Streamed to the file block by block, so memory stays flat however long the piece is
+                        blocks = self._render_blocks(timelines)
+                        # Raw synth blocks are on the 16-bit scale; they're streamed at that level, un-normalized
+                        self._write_blocks(stream.tee(blocks, 1 / 32768) if stream else blocks, Path(output_path))
+                except Exception as e:
+                    print(f"⚠️  FluidSynth rendering failed ({e}), falling back to basic synthesis")
+                    audio = self._mix_with_pretty_midi(timelines)
+                    cacheable = False
             else:
                 print("⚠️  FluidR3 soundfont not found, using basic synthesis")
-                audio = self._render_with_pretty_midi(midi_path, layer_type)
+                audio = self._mix_with_pretty_midi(timelines)
             
-            # Save as WAV
-            sf.write(str(output_path), audio, self.sample_rate)
+            # Save as WAV. An existing file may be hard-linked to a cache entry, so replace it rather than write through it
+            if audio is not None:
+                Path(output_path).unlink(missing_ok=True)
+                sf.write(str(output_path), audio, self.sample_rate)
+                # Renders that finish in memory are streamed in one go; a stream cut off by a failed render is left as it is
+                if stream and not stream.started:
+                    stream.write(audio)
+            if stream:
+                stream.close()
+            if cacheable:
+                cache.store(cache_key, Path(output_path))
             return True
             
         except Exception as e:
             print(f"❌ Error rendering audio: {e}")
             return False
     
-    def _render_with_fluidsynth(self, midi_path: Path, layer_type: str, instrument_program: int = 0) -> np.ndarray:
-        """Render using FluidSynth with FluidR3 soundfont."""
+    def render_midi_to_wav(self, midi_path: Path, output_path: Path, layer_type: str = "melody", instrument_program: int = 0) -> bool:
+        """Render an existing MIDI file to WAV audio using FluidSynth with FluidR3."""
         try:
-            # Initialize FluidSynth
-            fs = fluidsynth.Synth(samplerate=self.sample_rate)
-            
-            # Load the FluidR3 soundfont
-            sfid = fs.sfload(self.soundfont_path)
-            if sfid == -1:
-                raise Exception("Failed to load FluidR3 soundfont")
+            timeline = self._timeline_from_midi(midi_path, layer_type, instrument_program)
+        except Exception as e:
+            print(f"❌ Error reading MIDI file: {e}")
+            return False
+        return self.render_timeline_to_wav(timeline, output_path)
+    
+    @staticmethod
+    def _timeline_from_midi(midi_path: Path, layer_type: str, instrument_program: int = 0) -> Timeline:
+        """Load a MIDI file into a Timeline on a 120 BPM tick grid (tempo changes already applied)."""
+        midi_data = pretty_midi.PrettyMIDI(str(midi_path))
+        midi_notes = [note for instrument in midi_data.instruments for note in instrument.notes]
+        ticks_per_second = 120 * TICKS_PER_BEAT / 60.0
+        
+        notes = np.zeros(len(midi_notes), dtype=NOTE_DTYPE)
+        notes["start"] = np.round(np.array([note.start for note in midi_notes]) * ticks_per_second)
+        notes["end"] = np.round(np.array([note.end for note in midi_notes]) * ticks_per_second)
+        notes["note"] = [note.pitch for note in midi_notes]
+        notes["velocity"] = [note.velocity for note in midi_notes]
+        return Timeline(notes, layer_type, instrument_program, bpm=120)
+    
+    def _total_samples(self, timelines: List[Timeline]) -> int:
+        duration = max(4.0, max(timeline.end_seconds() for timeline in timelines))  # Minimum 4 seconds
+        return int(duration * self.sample_rate)
+    
+    def _segmented(self, timelines: List[Timeline]) -> bool:
+        """Whether a streaming render of these timelines is split into parallel segments.
+        
+        Never inside a worker process (e.g. an arrangement render worker): those already run in
+        parallel, and a nested segment pool left behind in them keeps the worker from exiting.
+        """
+        if multiprocessing.parent_process() is not None:
+            return False
+        return RENDER_SEGMENT_SECONDS > 0 and self._total_samples(timelines) > RENDER_SEGMENT_SECONDS * self.sample_rate
+    
+    def _merged_events(self, timelines: List[Timeline]) -> Tuple[np.ndarray, np.ndarray]:
+        """All timelines' events on their assigned channels, ordered by sample offset, with the offsets."""
+        channels = assign_channels(timelines)
+        # Each timeline's events are already time-ordered; convert ticks to sample offsets and merge the layers
+        events = np.concatenate([timeline.events for timeline in timelines])
+        events["channel"] = np.repeat(channels, [len(timeline.events) for timeline in timelines])
+        offsets = np.concatenate([
+            np.round(timeline.events["tick"] * (timeline.seconds_per_tick * self.sample_rate)).astype(np.int64)
+            for timeline in timelines
+        ])
+        order = np.lexsort((events["note_on"], offsets))
+        return events[order], offsets[order]
+    
+    def _render_with_fluidsynth(self, timelines: Union[Timeline, List[Timeline]], start: int = 0, end: Optional[int] = None,
+                                normalize: bool = True) -> np.ndarray:
+        """Render using FluidSynth with FluidR3 soundfont; several timelines play together on separate channels.
+        
+        `start` and `end` limit the render to that range of sample frames (events before `start` are skipped).
+        """
+        timelines = [timelines] if isinstance(timelines, Timeline) else timelines
+        if start == 0 and end is None and self._segmented(timelines):
+            return self._render_segments(timelines)
+        
+        # Calculate duration and prepare audio buffer
+        end = self._total_samples(timelines) if end is None else end
+        audio = np.empty((end - start, 2), dtype=np.float32)
+        peak = 0.0
+        position = 0
+        for block in self._render_blocks(timelines, start, end):
+            audio[position:position + len(block)] = block
+            position += len(block)
+            peak = max(peak, float(np.abs(block).max()))
+        
+        # Normalize in place with headroom
+        if normalize and peak > 0:
+            audio *= 0.8 / peak
+        return audio
+    
+    def _render_blocks(self, timelines: List[Timeline], start: int = 0, end: Optional[int] = None) -> Iterator[np.ndarray]:
+        """Render frames start..end on one pooled synth, yielding un-normalized stereo blocks as they're produced.
+        
+        Blocks are RENDER_BLOCK_SIZE frames (the last may be shorter) and share one buffer, so each is only
+        valid until the next is requested.
+        """
+        # Check out a pooled synth (soundfont already loaded, channels reset)
+        with self.synth_pool.synth() as (fs, sfid):
+            # Set up channels and programs based on layer type
+            for timeline, channel in zip(timelines, assign_channels(timelines)):
+                self._setup_fluidsynth_instruments(fs, sfid, timeline.layer_type, timeline.program, channel)
             
-            # Load and process the MIDI file
-            midi_data = pretty_midi.PrettyMIDI(str(midi_path))
+            end = self._total_samples(timelines) if end is None else end
+            events, offsets = self._merged_events(timelines)
+            in_range = (offsets >= start) & (offsets < end)
+            events, offsets = events[in_range], offsets[in_range] - start
             
-            # Set up channels and programs based on layer type
-            self._setup_fluidsynth_instruments(fs, sfid, layer_type, instrument_program)
-            
-            # Calculate duration and prepare audio buffer
-            duration = max(4.0, midi_data.get_end_time())  # Minimum 4 seconds
-            total_samples = int(duration * self.sample_rate)
-            
-            # Process all MIDI events
-            events = []
-            for instrument in midi_data.instruments:
-                if layer_type == "drums":
-                    # Force drums to channel 9 (0-indexed = 9)
-                    channel = 9
-                    instrument.is_drum = True
-                else:
-                    channel = 0  # Use channel 0 for melodic instruments
-                
-                for note in instrument.notes:
-                    # Note on event
-                    events.append((note.start, 'note_on', channel, note.pitch, note.velocity))
-                    # Note off event  
-                    events.append((note.end, 'note_off', channel, note.pitch, 64))
-            
-            # Sort events by time
-            events.sort(key=lambda x: x[0])
-            
-            # Render audio
-            audio_data = []
-            current_time = 0.0
-            
-            for event_time, event_type, channel, pitch, velocity in events:
-                # Render silence until next event
-                if event_time > current_time:
-                    silence_samples = int((event_time - current_time) * self.sample_rate)
-                    if silence_samples > 0:
-                        silence = fs.get_samples(silence_samples)
-                        audio_data.extend(silence)
-                
-                # Send MIDI event
-                if event_type == 'note_on':
-                    fs.noteon(channel, pitch, velocity)
-                elif event_type == 'note_off':
-                    fs.noteoff(channel, pitch)
-                    
-                current_time = event_time
+            yield from self._event_blocks(
+                fs,
+                offsets.tolist(),
+                events["note_on"].tolist(),
+                events["channel"].tolist(),
+                events["note"].tolist(),
+                events["velocity"].tolist(),
+                end - start,
+            )
+    
+    def _write_blocks(self, blocks: Iterator[np.ndarray], output_path: Path):
+        """Write rendered blocks to `output_path` with constant memory, normalized like the in-memory render.
+        
+        Blocks go to a raw float32 scratch file while the peak is measured; a second pass reads it back
+        memory-mapped, applies the gain and writes the output through soundfile (format from the extension).
+        """
+        scratch = temp_path(output_path)
+        try:
+            peak = 0.0
+            frames = 0
+            with open(scratch, "wb") as f:
+                for block in blocks:
+                    f.write(block.tobytes())
+                    frames += len(block)
+                    peak = max(peak, float(np.abs(block).max()))
             
-            # Render any remaining audio
-            remaining_samples = total_samples - len(audio_data)
-            if remaining_samples > 0:
-                final_audio = fs.get_samples(remaining_samples)
-                audio_data.extend(final_audio)
+            # An existing file may be hard-linked to a cache entry, so replace it rather than write through it
+            output_path.unlink(missing_ok=True)
+            with sf.SoundFile(str(output_path), "w", samplerate=self.sample_rate, channels=2) as out:
+                if frames:
+                    raw = np.memmap(scratch, dtype=np.float32, mode="r", shape=(frames, 2))
+                    chunk = RENDER_BLOCK_SIZE * 16
+                    for position in range(0, frames, chunk):
+                        block = raw[position:position + chunk]
+                        # Normalize with headroom
+                        out.write(block * (0.8 / peak) if peak > 0 else block)
+                    del raw
+        finally:
+            scratch.unlink(missing_ok=True)
+    
+    def _render_segments(self, timelines: List[Timeline]) -> np.ndarray:
+        """Render time segments in parallel processes, then crossfade them into one normalized buffer."""
+        total_samples = self._total_samples(timelines)
+        segment = int(RENDER_SEGMENT_SECONDS * self.sample_rate)
+        fade = min(int(RENDER_CROSSFADE_SECONDS * self.sample_rate), segment)
+        preroll = int(RENDER_PREROLL_SECONDS * self.sample_rate)
+        bounds = list(range(0, total_samples, segment)) + [total_samples]
+        
+        # Notes still sounding (or releasing) at a segment's start have to be started inside its pre-roll
+        starts, ends = [], []
+        for timeline in timelines:
+            samples_per_tick = timeline.seconds_per_tick * self.sample_rate
+            starts.append(np.round(timeline.notes["start"] * samples_per_tick).astype(np.int64))
+            ends.append(np.round(timeline.notes["end"] * samples_per_tick).astype(np.int64))
+        starts, ends = np.concatenate(starts), np.concatenate(ends)
+        
+        jobs = []
+        for index in range(len(bounds) - 1):
+            keep_from = max(0, bounds[index] - fade) if index else 0
+            held = starts[(starts < keep_from) & (ends > keep_from - preroll)]
+            render_from = max(0, min(keep_from - preroll, int(held.min()) if len(held) else keep_from))
+            jobs.append((render_from, keep_from, bounds[index + 1]))
+        
+        print(f"🎛️  Rendering {len(jobs)} segments of {RENDER_SEGMENT_SECONDS:g}s in parallel")
+        pool = _get_segment_pool()
+        futures = [pool.submit(_render_segment, self.sample_rate, timelines, render_from, end, keep_from - render_from)
+                   for render_from, keep_from, end in jobs]
+        
+        audio = np.empty((total_samples, 2), dtype=np.float32)
+        ramp = np.linspace(0.0, 1.0, fade, dtype=np.float32)[:, None]
+        for (_, keep_from, end), future in zip(jobs, futures):
+            piece = future.result()
+            if keep_from == 0:
+                audio[:end] = piece
+                continue
+            # The first `fade` frames overlap the end of the previous segment
+            audio[keep_from:keep_from + fade] *= 1.0 - ramp
+            audio[keep_from:keep_from + fade] += piece[:fade] * ramp
+            audio[keep_from + fade:end] = piece[fade:]
+        
+        # Normalize in place with headroom
+        peak = float(np.abs(audio).max()) if total_samples else 0.0
+        if peak > 0:
+            audio *= 0.8 / peak
+        return audio
+    
+    def _render_with_note_samples(self, timelines: Union[Timeline, List[Timeline]]) -> np.ndarray:
+        """Render each distinct (pitch, velocity step, length) note once and overlap-add copies of it.
+        
+        Notes keep their release tails, which run on past the note-off and sum with whatever
+        follows, up to the end of the buffer. Several timelines are mixed into the same buffer, which
+        is normalized like the streaming render.
+        """
+        timelines = [timelines] if isinstance(timelines, Timeline) else timelines
+        duration = max(4.0, max(timeline.end_seconds() for timeline in timelines))  # Minimum 4 seconds, as in the streaming render
+        audio = np.zeros((int(duration * self.sample_rate), 2), dtype=np.float32)
+        for timeline in timelines:
+            self._mix_note_samples(timeline, audio)
+        
+        # Normalize in place with headroom
+        peak = float(np.abs(audio).max()) if len(audio) else 0.0
+        if peak > 0:
+            audio *= 0.8 / peak
+        return audio
+    
+    def _mix_note_samples(self, timeline: Timeline, audio: np.ndarray):
+        """Overlap-add one timeline's notes into `audio`."""
+        notes = timeline.notes
+        samples_per_tick = timeline.seconds_per_tick * self.sample_rate
+        starts = np.round(notes["start"] * samples_per_tick).astype(np.int64)
+        lengths = np.maximum(np.round(notes["end"] * samples_per_tick).astype(np.int64) - starts, 1)
+        velocities = notes["velocity"].astype(np.int64)
+        steps = np.clip((velocities + NOTE_VELOCITY_STEP // 2) // NOTE_VELOCITY_STEP * NOTE_VELOCITY_STEP, 1, 127)
+        # Level follows velocity squared, so this corrects the stepped velocity back to the exact one
+        gains = ((velocities / steps) ** 2).astype(np.float32)
+        
+        total_samples = len(audio)
+        
+        # One code per distinct note; every note sharing a code reuses one rendered sample
+        codes = (lengths * 128 + steps) * 128 + notes["note"].astype(np.int64)
+        distinct, inverse, counts = np.unique(codes, return_inverse=True, return_counts=True)
+        # Group the events by code in one sort (stable, so each group keeps the notes' order)
+        groups = np.split(np.argsort(inverse, kind="stable"), np.cumsum(counts)[:-1])
+        rendered = 0
+        for code, members in zip(distinct.tolist(), groups):
+            length, rest = divmod(code, 128 * 128)
+            step, pitch = divmod(rest, 128)
+            sample, fresh = self._note_sample(timeline.layer_type, timeline.program, pitch, step, length)
+            rendered += fresh
             
-            # Convert to numpy array and normalize
-            audio = np.array(audio_data, dtype=np.float32)
-            if len(audio) > 0:
-                max_val = np.max(np.abs(audio))
-                if max_val > 0:
-                    audio = audio / max_val * 0.8  # Normalize with headroom
+            group_starts = starts[members]
+            group_ends = np.minimum(group_starts + len(sample), total_samples)
+            audible = group_ends > group_starts
+            for start, end, gain in zip(group_starts[audible].tolist(), group_ends[audible].tolist(), gains[members][audible].tolist()):
+                audio[start:end] += sample[:end - start] * gain
+        
+        print(f"🎵 Note samples: {len(distinct)} distinct {timeline.layer_type} notes for {len(notes)} events ({rendered} newly rendered)")
+    
+    def _note_sample(self, layer_type: str, program: int, pitch: int, velocity: int, length: int) -> Tuple[np.ndarray, bool]:
+        """One note held for `length` frames plus its release tail, from the cache or freshly rendered."""
+        channel, bank, program = (9, 128, 0) if layer_type == "drums" else (0, 0, program)
+        key = (self.soundfont_path, self.sample_rate, bank, program, pitch, velocity, length)
+        sample = note_samples.get(key)
+        if sample is not None:
+            return sample, False
+        
+        max_tail = int(NOTE_TAIL_MAX_SECONDS * self.sample_rate)
+        with self.synth_pool.synth() as (fs, sfid):
+            fs.program_select(channel, sfid, bank, program)
+            fs.noteon(channel, pitch, velocity)
+            blocks = [fs.get_samples(length).reshape(-1, 2)]
+            fs.noteoff(channel, pitch)
+            tail = 0
+            while tail < max_tail:
+                block = fs.get_samples(min(RENDER_BLOCK_SIZE, max_tail - tail)).reshape(-1, 2)
+                blocks.append(block)
+                tail += len(block)
+                if int(np.abs(block).max()) <= NOTE_TAIL_THRESHOLD:
+                    break
+        
+        sample = np.concatenate(blocks).astype(np.float32)
+        note_samples.put(key, sample)
+        return sample, True
+    
+    def _event_blocks(self, fs: fluidsynth.Synth, offsets: List[int], note_ons: List[bool], channels: List[int],
+                      pitches: List[int], velocities: List[int], total_samples: int) -> Iterator[np.ndarray]:
+        """Render sorted events into stereo float32 blocks of RENDER_BLOCK_SIZE frames, yielded one at a time.
+        
+        Events are applied at their exact sample offset inside each block. One buffer is reused for
+        every block, so memory doesn't grow with the length of the render.
+        """
+        buffer = np.empty((RENDER_BLOCK_SIZE, 2), dtype=np.float32)
+        event, event_count = 0, len(offsets)
+        
+        for block_start in range(0, total_samples, RENDER_BLOCK_SIZE):
+            block_end = min(block_start + RENDER_BLOCK_SIZE, total_samples)
+            block = buffer[:block_end - block_start]
+            position = block_start
             
-            # Clean up FluidSynth
-            fs.delete()
+            while event < event_count and offsets[event] < block_end:
+                # Render up to the event, then send it
+                offset = offsets[event]
+                if offset > position:
+                    block[position - block_start:offset - block_start] = fs.get_samples(offset - position).reshape(-1, 2)
+                    position = offset
+                
+                if note_ons[event]:
+                    fs.noteon(channels[event], pitches[event], velocities[event])
+                else:
+                    fs.noteoff(channels[event], pitches[event])
+                event += 1
             
-            return audio
+            if block_end > position:
+                block[position - block_start:] = fs.get_samples(block_end - position).reshape(-1, 2)
             
-        except Exception as e:
-            print(f"⚠️  FluidSynth rendering failed ({e}), falling back to basic synthesis")
-            return self._render_with_pretty_midi(midi_path, layer_type)
+            yield block
     
-    def _setup_fluidsynth_instruments(self, fs: fluidsynth.Synth, sfid: int, layer_type: str, instrument_program: int = 0):
-        """Set up FluidSynth instruments based on layer type."""
+    def _setup_fluidsynth_instruments(self, fs: fluidsynth.Synth, sfid: int, layer_type: str, instrument_program: int = 0,
+                                      channel: Optional[int] = None):
+        """Set up FluidSynth instruments based on layer type (melodic layers on `channel`, default 0)."""
         if layer_type == "drums":
             # Set up drum kit on channel 9 (MIDI standard)
             # For FluidSynth, drum sounds are in bank 128, program 0
             fs.program_select(9, sfid, 128, 0)  # Channel 9, soundfont, bank 128, program 0
             print(f"🥁 FluidSynth: Set up drums on channel 9, bank 128, program 0")
         else:
-            # Set up custom instrument on channel 0, bank 0
-            fs.program_select(0, sfid, 0, instrument_program)
-            print(f"🎵 FluidSynth: Set up {layer_type} on channel 0, bank 0, program {instrument_program}")
+            # Set up custom instrument on its channel, bank 0
+            channel = channel or 0
+            fs.program_select(channel, sfid, 0, instrument_program)
+            print(f"🎵 FluidSynth: Set up {layer_type} on channel {channel}, bank 0, program {instrument_program}")
     
-    def _render_with_pretty_midi(self, midi_path: Path, layer_type: str) -> np.ndarray:
+    def _timeline_to_pretty_midi(self, timeline: Timeline) -> pretty_midi.PrettyMIDI:
+        """Build a pretty_midi object in memory from a Timeline."""
+        midi_data = pretty_midi.PrettyMIDI(initial_tempo=timeline.bpm)
+        instrument = pretty_midi.Instrument(program=timeline.program, is_drum=timeline.layer_type == "drums")
+        seconds_per_tick = timeline.seconds_per_tick
+        for start, end, note, velocity in timeline.notes.tolist():
+            instrument.notes.append(pretty_midi.Note(velocity=velocity, pitch=note, start=start * seconds_per_tick, end=end * seconds_per_tick))
+        midi_data.instruments.append(instrument)
+        return midi_data
+    
+    def _mix_with_pretty_midi(self, timelines: List[Timeline]) -> np.ndarray:
+        """Fallback for several layers: render each with pretty_midi and sum them."""
+        if len(timelines) == 1:
+            return self._render_with_pretty_midi(timelines[0])
+        layers = [np.asarray(self._render_with_pretty_midi(timeline)) for timeline in timelines]
+        audio = np.zeros(max(len(layer) for layer in layers))
+        for layer in layers:
+            audio[:len(layer)] += layer
+        peak = np.max(np.abs(audio))
+        return audio / peak * 0.8 if peak > 0 else audio
+    
+    def _render_with_pretty_midi(self, timeline: Timeline) -> np.ndarray:
         """Fallback: render using pretty_midi's built-in synthesizer."""
+        layer_type = timeline.layer_type
         try:
-            midi_data = pretty_midi.PrettyMIDI(str(midi_path))
+            midi_data = self._timeline_to_pretty_midi(timeline)
             
             # Set appropriate instruments
             self._set_instruments_for_layer(midi_data, layer_type)
@@ -188,14 +642,71 @@ class AudioRenderer:
                 instrument.program = program
                 instrument.is_drum = False
 
-def render_audio(midi_path: Path, output_dir: Path, layer_type: str, instrument_program: int = 0) -> Optional[Path]:
-    """Convenience function to render MIDI to audio using FluidR3."""
-    renderer = AudioRenderer()
+# Segment renders run in their own processes, each keeping a warm synth pool between renders
+_segment_pool: Optional[ProcessPoolExecutor] = None
+
+def _init_segment_worker():
+    # Segment workers would repeat the parent's progress output, and in worker mode stdout is the protocol channel
+    sys.stdout = open(os.devnull, "w")
+
+def _get_segment_pool() -> ProcessPoolExecutor:
+    global _segment_pool
+    if _segment_pool is None:
+        # "spawn" so workers never inherit FluidSynth state from a warm parent process
+        _segment_pool = ProcessPoolExecutor(
+            max_workers=max(1, RENDER_PROCESSES),
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_segment_worker,
+        )
+    return _segment_pool
+
+def _render_segment(sample_rate: int, timelines: List[Timeline], start: int, end: int, keep_from: int) -> np.ndarray:
+    """Render frames start..end un-normalized in a segment worker and return those from `keep_from` on."""
+    renderer = AudioRenderer(sample_rate=sample_rate, backend="stream")
+    return renderer._render_with_fluidsynth(timelines, start, end, normalize=False)[keep_from:]
+
+_renderers: Dict[int, AudioRenderer] = {}
+
+def get_renderer(sample_rate: int = 44100) -> AudioRenderer:
+    """Return the process-wide renderer for a sample rate so the soundfont is only loaded once."""
+    renderer = _renderers.get(sample_rate)
+    if renderer is None:
+        renderer = _renderers.setdefault(sample_rate, AudioRenderer(sample_rate=sample_rate))
+    return renderer
+
+def render_mix(timelines: List[Timeline], output_dir: Path, name: str = "mix", sample_rate: int = 44100) -> Optional[Path]:
+    """Render several layer timelines into one mixed WAV in a single synth pass."""
+    renderer = get_renderer(sample_rate)
+    wav_path = output_dir / f"{name}.wav"
+    
+    layers = ", ".join(timeline.layer_type for timeline in timelines)
+    print(f"🎵 Rendering {layers} to one mix with FluidR3...")
+    
+    if renderer.render_mix_to_wav(timelines, wav_path):
+        print(f"✅ Mix saved to {wav_path}")
+        return wav_path
+    else:
+        print(f"❌ Failed to render the mix")
+        return None
+
+def render_audio(source: Union[Timeline, Path], output_dir: Path, layer_type: str, instrument_program: int = 0,
+                 on_chunk: Optional[Callable[[bytes], None]] = None, sample_rate: int = 44100) -> Optional[Path]:
+    """Convenience function to render a Timeline (or an existing MIDI file) to audio using FluidR3.
+    
+    `on_chunk` receives the audio as a progressive WAV stream while it renders (Timelines only).
+    Compressed formats are encoded from this WAV afterwards (see generation/encoder.py).
+    """
+    renderer = get_renderer(sample_rate)
     wav_path = output_dir / f"{layer_type}.wav"
     
-    print(f"🎵 Rendering {layer_type} MIDI to audio with FluidR3...")
+    print(f"🎵 Rendering {layer_type} to audio with FluidR3...")
+    
+    if isinstance(source, Timeline):
+        rendered = renderer.render_timeline_to_wav(source, wav_path, on_chunk)
+    else:
+        rendered = renderer.render_midi_to_wav(source, wav_path, layer_type, instrument_program)
     
-    if renderer.render_midi_to_wav(midi_path, wav_path, layer_type, instrument_program):
+    if rendered:
         print(f"✅ Audio saved to {wav_path}")
         return wav_path
     else:
@@ -0,0 +1,69 @@
+import struct
+from pathlib import Path
+from typing import Callable, Iterator
+
+import numpy as np
+import soundfile as sf
+
+# Frames per chunk handed to the callback; a quarter of a second at 44.1kHz
+STREAM_CHUNK_FRAMES = 11025
+
+class WavChunkStream:
+    """Encodes audio blocks into a progressive 16-bit stereo WAV and passes it on in chunks.
+
+    The header goes out with the first chunk and declares an open-ended length (0xFFFFFFFF),
+    which players treat as "read until the stream ends", so playback can start before the
+    render finishes. `send` is called with each encoded chunk as bytes.
+    """
+
+    def __init__(self, send: Callable[[bytes], None], sample_rate: int, chunk_frames: int = STREAM_CHUNK_FRAMES):
+        self.send = send
+        self.sample_rate = sample_rate
+        self.chunk_frames = chunk_frames
+        self.started = False
+        self.frames = 0
+        self._pending = []
+        self._pending_frames = 0
+
+    def header(self) -> bytes:
+        channels, bits = 2, 16
+        block_align = channels * bits // 8
+        return (b"RIFF" + struct.pack("<I", 0xFFFFFFFF) + b"WAVE"
+                + b"fmt " + struct.pack("<IHHIIHH", 16, 1, channels, self.sample_rate, self.sample_rate * block_align, block_align, bits)
+                + b"data" + struct.pack("<I", 0xFFFFFFFF))
+
+    def write(self, audio: np.ndarray, gain: float = 1.0):
+        """Queue float audio in -1..1 (mono or stereo), scaled by `gain`, and send every full chunk."""
+        audio = np.asarray(audio, dtype=np.float32) * gain
+        if audio.ndim == 1:
+            audio = np.repeat(audio[:, None], 2, axis=1)
+        # Converted right away, so callers may reuse their buffer
+        self._pending.append((np.clip(audio, -1.0, 1.0) * 32767).astype("<i2"))
+        self._pending_frames += len(audio)
+        if self._pending_frames >= self.chunk_frames:
+            self.flush()
+
+    def flush(self):
+        if not self.started:
+            self.started = True
+            self.send(self.header())
+        if self._pending_frames:
+            self.send(np.concatenate(self._pending).tobytes())
+            self.frames += self._pending_frames
+            self._pending = []
+            self._pending_frames = 0
+
+    def close(self):
+        """Send whatever is still queued (and the header, if nothing was sent yet)."""
+        self.flush()
+
+    def tee(self, blocks: Iterator[np.ndarray], gain: float = 1.0) -> Iterator[np.ndarray]:
+        """Stream each block as it passes through to the next consumer."""
+        for block in blocks:
+            self.write(block, gain)
+            yield block
+
+    def write_file(self, path: Path):
+        """Stream an existing audio file, e.g. a cached render."""
+        for block in sf.blocks(str(path), blocksize=self.chunk_frames, dtype="float32", always_2d=True):
+            self.write(block if block.shape[1] == 2 else np.repeat(block[:, :1], 2, axis=1))
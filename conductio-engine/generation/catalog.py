@@ -0,0 +1,74 @@
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Optional
+
+from ai.cache import temp_path
+from generation import instruments
+from generation.instruments import INSTRUMENT_INDEX, LAYER_DEFAULT_INSTRUMENTS, get_note_range
+
+# Bump when the catalog layout changes so readers can reject files they don't understand
+CATALOG_VERSION = 1
+DEFAULT_CATALOG_PATH = os.getenv("CONDUCTIO_INSTRUMENT_CATALOG", ".cache/instrument_catalog.json")
+
+def source_hash() -> str:
+    """Hash of generation/instruments.py; the catalog is stale once this changes."""
+    with open(instruments.__file__, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+def build_catalog() -> dict:
+    """Versioned, JSON-ready description of every instrument the engine knows about."""
+    index = INSTRUMENT_INDEX.to_dict()
+    category_of = {}
+    for category, names in index["categories"].items():
+        for name in names:
+            category_of.setdefault(name, category)
+
+    programs = []
+    for name, program in sorted(index["instruments"].items(), key=lambda item: item[1]):
+        low, high = get_note_range(program)
+        programs.append({
+            "id": program,
+            "name": name,
+            "displayName": name.replace("_", " ").title(),
+            "category": category_of.get(name),
+            "noteRange": [low, high],
+        })
+
+    catalog = {
+        "version": CATALOG_VERSION,
+        "sourceHash": source_hash(),
+        "programs": programs,
+        "categories": index["categories"],
+        "aliases": index["aliases"],
+        "layerDefaults": LAYER_DEFAULT_INSTRUMENTS,
+    }
+    # Content hash over everything above, used by the API as the catalog's ETag
+    payload = json.dumps(catalog, sort_keys=True).encode("utf-8")
+    catalog["contentHash"] = hashlib.sha256(payload).hexdigest()
+    return catalog
+
+def read_catalog(path: str = DEFAULT_CATALOG_PATH) -> Optional[dict]:
+    try:
+        with open(path, "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def export_catalog(path: str = DEFAULT_CATALOG_PATH, force: bool = False) -> bool:
+    """Write the instrument catalog to `path` unless an up-to-date copy is already there.
+
+    Returns True if the file was (re)written.
+    """
+    existing = read_catalog(path)
+    if not force and existing and existing.get("version") == CATALOG_VERSION and existing.get("sourceHash") == source_hash():
+        return False
+
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = temp_path(path)
+    with open(tmp_path, "w") as f:
+        json.dump(build_catalog(), f, indent=2)
+    os.replace(tmp_path, path)
+    return True
@@ -0,0 +1,72 @@
+import os
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Optional
+
+import soundfile as sf
+
+from ai.cache import temp_path
+
+AUDIO_FORMATS = ("wav", "flac", "ogg", "opus")
+
+# soundfile container and codec per compressed format; "ogg" is Vorbis
+ENCODINGS = {
+    "flac": ("FLAC", "PCM_16"),
+    "ogg": ("OGG", "VORBIS"),
+    "opus": ("OGG", "OPUS"),
+}
+
+# Opus only takes 8, 12, 16, 24 or 48kHz, so Opus output is rendered at 48kHz rather than resampled
+FORMAT_SAMPLE_RATES = {"opus": 48000}
+
+ENCODE_BLOCK_FRAMES = 65536
+
+# One background thread, so encodes never compete with rendering for more than one core
+_encoder: Optional[ThreadPoolExecutor] = None
+
+def format_sample_rate(audio_format: str, default: int = 44100) -> int:
+    """Sample rate to render at for `audio_format`."""
+    return FORMAT_SAMPLE_RATES.get(audio_format, default)
+
+def encode_audio(wav_path: Path, audio_format: str) -> Optional[Path]:
+    """Encode a rendered WAV to `audio_format` next to it and remove the WAV.
+
+    Returns the encoded file, or the WAV itself if encoding fails (so the package still has audio).
+    """
+    wav_path = Path(wav_path)
+    if audio_format == "wav":
+        return wav_path
+    container, subtype = ENCODINGS[audio_format]
+    output_path = wav_path.with_suffix(f".{audio_format}")
+    tmp_path = temp_path(output_path)
+
+    try:
+        with sf.SoundFile(str(wav_path)) as source, \
+                sf.SoundFile(str(tmp_path), "w", samplerate=source.samplerate, channels=source.channels,
+                             format=container, subtype=subtype) as out:
+            for block in source.blocks(blocksize=ENCODE_BLOCK_FRAMES, dtype="float32", always_2d=True):
+                out.write(block)
+        os.replace(tmp_path, output_path)
+    except Exception as e:
+        tmp_path.unlink(missing_ok=True)
+        print(f"⚠️  Could not encode {wav_path.name} to {audio_format} ({e}), keeping the WAV")
+        return wav_path
+
+    # The WAV may be hard-linked to a render cache entry; unlinking it here leaves the cache intact
+    wav_path.unlink(missing_ok=True)
+    print(f"🗜️  Encoded {wav_path.name} to {output_path.name} ({output_path.stat().st_size // 1024} KB)")
+    return output_path
+
+def encode_in_background(wav_path: Path, audio_format: str) -> "Future[Optional[Path]]":
+    """Queue `encode_audio` on the background encoder thread."""
+    global _encoder
+    if _encoder is None:
+        _encoder = ThreadPoolExecutor(max_workers=1, thread_name_prefix="conductio-encoder")
+    return _encoder.submit(encode_audio, wav_path, audio_format)
+
+def wait_for_encodes():
+    """Block until every queued encode (and its done callbacks) has finished."""
+    global _encoder
+    if _encoder is not None:
+        _encoder.shutdown(wait=True)
+        _encoder = None
@@ -1,6 +1,10 @@
 # General MIDI Instrument Mappings for FluidR3
 # Program numbers are 0-indexed (subtract 1 from standard GM numbers)
 
+import re
+from collections import Counter, defaultdict
+from typing import Dict, List, Optional, Tuple
+
 GM_INSTRUMENTS = {
     # Piano Family (0-7)
     "acoustic_grand_piano": 0,
@@ -203,14 +207,162 @@ INSTRUMENT_ALIASES = {
     "synth": 81,
     "lead": 81,
     "pad": 89,
+    
+    # Common misspellings and variants
+    "honkey_tonk_piano": 3,
+    "honky_tonk": 3,
+    "violin_1": 40,
+}
+
+# Category ranges shown by --list-instruments, plus a hand-picked "Popular" list
+INSTRUMENT_CATEGORY_RANGES = {
+    "Piano": (0, 7),
+    "Guitar": (24, 31),
+    "Bass": (32, 39),
+    "Strings": (40, 47),
+    "Brass": (56, 63),
+    "Woodwinds": (64, 79),
+    "Synth": (80, 95),
 }
+POPULAR_INSTRUMENTS = [
+    "acoustic_grand_piano", "electric_piano_1", "acoustic_guitar_steel", "electric_guitar_clean", "acoustic_bass",
+    "electric_bass_finger", "violin", "trumpet", "alto_sax", "flute",
+]
+
+LAYER_DEFAULT_INSTRUMENTS = {
+    "melody": 0,    # Acoustic Grand Piano
+    "bass": 32,     # Acoustic Bass
+    "chords": 0,    # Acoustic Grand Piano
+    "drums": 0,     # Drums use channel 9, program doesn't matter
+}
+
+# Playable MIDI note ranges per GM family of eight programs, with overrides for the odd ones out
+FAMILY_NOTE_RANGES = [
+    (21, 108),  # Piano
+    (60, 108),  # Chromatic percussion
+    (36, 96),   # Organ
+    (40, 88),   # Guitar
+    (28, 67),   # Bass
+    (36, 96),   # Strings
+    (28, 96),   # Ensemble
+    (40, 82),   # Brass
+    (49, 87),   # Reed
+    (60, 96),   # Pipe
+    (36, 96),   # Synth lead
+    (36, 96),   # Synth pad
+    (36, 96),   # Synth effects
+    (36, 84),   # Ethnic
+    (36, 84),   # Percussive
+    (36, 84),   # Sound effects
+]
+NOTE_RANGE_OVERRIDES = {
+    8: (60, 108),   # Celesta
+    9: (72, 108),   # Glockenspiel
+    11: (53, 89),   # Vibraphone
+    12: (45, 96),   # Marimba
+    13: (65, 108),  # Xylophone
+    19: (24, 108),  # Church organ
+    40: (55, 103),  # Violin
+    41: (48, 91),   # Viola
+    42: (36, 76),   # Cello
+    43: (28, 67),   # Contrabass
+    46: (23, 103),  # Orchestral harp
+    47: (40, 55),   # Timpani
+    52: (48, 79),   # Choir aahs
+    53: (48, 79),   # Voice oohs
+    56: (54, 86),   # Trumpet
+    57: (40, 77),   # Trombone
+    58: (26, 58),   # Tuba
+    59: (54, 86),   # Muted trumpet
+    60: (34, 77),   # French horn
+    64: (56, 87),   # Soprano sax
+    65: (49, 81),   # Alto sax
+    66: (44, 76),   # Tenor sax
+    67: (36, 69),   # Baritone sax
+    68: (58, 91),   # Oboe
+    69: (52, 81),   # English horn
+    70: (34, 75),   # Bassoon
+    71: (50, 94),   # Clarinet
+    72: (74, 108),  # Piccolo
+    73: (60, 96),   # Flute
+    74: (60, 96),   # Recorder
+}
+
+def normalize_instrument_name(name: str) -> str:
+    """Lowercase, with runs of spaces/hyphens as underscores and any other punctuation dropped."""
+    return re.sub(r"[^a-z0-9_]", "", re.sub(r"[- ]+", "_", name.strip().lower()))
+
+def _trigrams(name: str) -> set:
+    padded = f"^{name}$"
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+class InstrumentIndex:
+    """Prebuilt lookup structures for resolving instrument names.
+    
+    Holds an exact map from normalized names and aliases to GM programs, a trigram index used to
+    rank fuzzy suggestions for unknown names, and the instrument categories.
+    """
+    
+    def __init__(self, instruments: Dict[str, int], aliases: Dict[str, int]):
+        self.instruments = dict(instruments)
+        self.aliases = dict(aliases)
+        
+        # GM names win over aliases that normalize to the same key
+        self.exact = {normalize_instrument_name(k): v for k, v in aliases.items()}
+        self.exact.update({normalize_instrument_name(k): v for k, v in instruments.items()})
+        self.names_by_program = {program: name for name, program in instruments.items()}
+        
+        self._grams = {name: _trigrams(name) for name in self.exact}
+        self._postings = defaultdict(list)
+        for name, grams in self._grams.items():
+            for gram in grams:
+                self._postings[gram].append(name)
+        
+        self.categories = {
+            category: [(k, v) for k, v in instruments.items() if low <= v <= high]
+            for category, (low, high) in INSTRUMENT_CATEGORY_RANGES.items()
+        }
+        self.categories["Popular"] = [(name, instruments[name]) for name in POPULAR_INSTRUMENTS]
+    
+    def resolve(self, name: str) -> Optional[int]:
+        """GM program for a name, alias or program number, or None if it isn't known."""
+        key = normalize_instrument_name(name)
+        if key.isdigit():
+            program = int(key)
+            return program if 0 <= program <= 127 else None
+        return self.exact.get(key)
+    
+    def suggest(self, name: str, limit: int = 5, min_score: float = 0.3) -> List[str]:
+        """Known names most similar to `name`, best first (Dice similarity over trigrams)."""
+        key = normalize_instrument_name(name)
+        grams = _trigrams(key)
+        shared = Counter(candidate for gram in grams for candidate in self._postings.get(gram, ()))
+        scored = []
+        for candidate, count in shared.items():
+            score = 2 * count / (len(grams) + len(self._grams[candidate]))
+            # Substring matches ("bass" in "fretless_bass") are always good suggestions
+            if key and (key in candidate or candidate in key):
+                score += 0.5
+            if score >= min_score:
+                scored.append((-score, candidate))
+        return [candidate for _, candidate in sorted(scored)[:limit]]
+    
+    def to_dict(self) -> dict:
+        """Plain-data form of the index for export to other services."""
+        return {
+            "instruments": self.instruments,
+            "aliases": self.aliases,
+            "categories": {category: [name for name, _ in members] for category, members in self.categories.items()},
+        }
+
+INSTRUMENT_INDEX = InstrumentIndex(GM_INSTRUMENTS, INSTRUMENT_ALIASES)
 
 def get_instrument_program(instrument_name: str) -> int:
     """
     Get GM program number for an instrument name.
     
     Args:
-        instrument_name: Name or number of instrument
+        instrument_name: Name, alias or number of instrument
         
     Returns:
         GM program number (0-127)
@@ -226,57 +378,25 @@ def get_instrument_program(instrument_name: str) -> int:
         else:
             raise ValueError(f"Program number must be 0-127, got {program}")
     
-    # Convert to lowercase and replace spaces/hyphens with underscores
-    name = instrument_name.lower().replace(" ", "_").replace("-", "_")
-    
-    # Check main instruments dict
-    if name in GM_INSTRUMENTS:
-        return GM_INSTRUMENTS[name]
-    
-    # Check aliases
-    if name in INSTRUMENT_ALIASES:
-        return INSTRUMENT_ALIASES[name]
+    program = INSTRUMENT_INDEX.resolve(instrument_name)
+    if program is not None:
+        return program
     
     # If not found, suggest close matches
-    similar = [k for k in list(GM_INSTRUMENTS.keys()) + list(INSTRUMENT_ALIASES.keys()) 
-               if name in k or k in name]
-    
+    similar = INSTRUMENT_INDEX.suggest(instrument_name)
     if similar:
-        raise ValueError(f"Instrument '{instrument_name}' not found. Did you mean: {', '.join(similar[:5])}?")
+        raise ValueError(f"Instrument '{instrument_name}' not found. Did you mean: {', '.join(similar)}?")
     else:
         raise ValueError(f"Instrument '{instrument_name}' not found. Use --list-instruments to see available instruments.")
 
 def get_default_instrument_for_layer(layer: str) -> int:
     """Get default instrument program for a layer type."""
-    defaults = {
-        "melody": 0,    # Acoustic Grand Piano
-        "bass": 32,     # Acoustic Bass
-        "chords": 0,    # Acoustic Grand Piano
-        "drums": 0,     # Drums use channel 9, program doesn't matter
-    }
-    return defaults.get(layer, 0)
+    return LAYER_DEFAULT_INSTRUMENTS.get(layer, 0)
+
+def get_note_range(program: int) -> Tuple[int, int]:
+    """Playable MIDI note range (lowest, highest) for a GM program."""
+    return NOTE_RANGE_OVERRIDES.get(program, FAMILY_NOTE_RANGES[program // 8])
 
-def list_instruments_by_category():
+def list_instruments_by_category() -> Dict[str, List[Tuple[str, int]]]:
     """Return instruments organized by category for help display."""
-    categories = {
-        "Piano": [(k, v) for k, v in GM_INSTRUMENTS.items() if 0 <= v <= 7],
-        "Guitar": [(k, v) for k, v in GM_INSTRUMENTS.items() if 24 <= v <= 31],
-        "Bass": [(k, v) for k, v in GM_INSTRUMENTS.items() if 32 <= v <= 39],
-        "Strings": [(k, v) for k, v in GM_INSTRUMENTS.items() if 40 <= v <= 47],
-        "Brass": [(k, v) for k, v in GM_INSTRUMENTS.items() if 56 <= v <= 63],
-        "Woodwinds": [(k, v) for k, v in GM_INSTRUMENTS.items() if 64 <= v <= 79],
-        "Synth": [(k, v) for k, v in GM_INSTRUMENTS.items() if 80 <= v <= 95],
-        "Popular": [
-            ("acoustic_grand_piano", GM_INSTRUMENTS["acoustic_grand_piano"]),
-            ("electric_piano_1", GM_INSTRUMENTS["electric_piano_1"]),
-            ("acoustic_guitar_steel", GM_INSTRUMENTS["acoustic_guitar_steel"]),
-            ("electric_guitar_clean", GM_INSTRUMENTS["electric_guitar_clean"]),
-            ("acoustic_bass", GM_INSTRUMENTS["acoustic_bass"]),
-            ("electric_bass_finger", GM_INSTRUMENTS["electric_bass_finger"]),
-            ("violin", GM_INSTRUMENTS["violin"]),
-            ("trumpet", GM_INSTRUMENTS["trumpet"]),
-            ("alto_sax", GM_INSTRUMENTS["alto_sax"]),
-            ("flute", GM_INSTRUMENTS["flute"]),
-        ]
-    }
-    return categories
\ No newline at end of file
+    return {category: list(members) for category, members in INSTRUMENT_INDEX.categories.items()}
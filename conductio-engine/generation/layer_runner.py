@@ -1,10 +1,12 @@
-from ai.prompt_builder import build_prompt
-from ai.client import generate_pattern
-from ai.pattern_parser import validate_pattern
-from generation.midi_builder import build_midi
-from generation.audio_renderer import render_audio
+from ai.prompt_builder import build_messages
+from ai.client import generate_pattern, stream_pattern
+from ai.pattern_parser import Pattern, PatternBuilder, expand_motifs, validate_pattern
+from generation.midi_builder import build_timeline, write_midi
+from generation.sections import generate_sectioned_pattern
 from generation.instruments import get_instrument_program, get_default_instrument_for_layer
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+from typing import Callable, List, Optional, Tuple
 import json, time, random
 
 def generate_creative_name() -> str:
@@ -25,28 +27,82 @@ def generate_creative_name() -> str:
     
     return f"{random.choice(adjectives)}_{random.choice(nouns)}"
 
-def run_layer(layer: str, key: str, bpm: int, bars: int, instrument: str = "auto", render_audio_flag: bool = True, genre: str = "general"):
-    """Run a single-layer AI generation (melody, drums, etc.)."""
+# Streamed events are validated in batches of this size
+STREAM_BATCH_SIZE = 16
+
+def stream_validated_pattern(prompt: List[dict], layer: str, key: str, bpm: int, bars: int, warm_synth: bool = True, pattern_format: str = "json") -> Pattern:
+    """Stream a pattern from the model, validating events as they arrive while the synth warms up."""
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=1) as warmer:
+        if warm_synth:
+            from generation.audio_renderer import get_renderer
+            warmer.submit(get_renderer().warm_up)
+        
+        stream = stream_pattern(prompt, layer=layer, key=key, bpm=bpm, bars=bars, pattern_format=pattern_format)
+        builder = PatternBuilder()
+        batch = []
+        for event in stream:
+            if not batch and len(builder) == 0:
+                print(f"🎼 First notes arrived after {time.perf_counter() - started:.1f}s")
+            batch.append(event)
+            if len(batch) >= STREAM_BATCH_SIZE:
+                builder.add(batch)
+                batch = []
+        builder.add(batch)
     
-    # Resolve instrument
+    if stream.partial:
+        print(f"⚠️  Using a partial pattern of {len(builder)} events")
+    data = stream.data or {}
+    metadata = data.get("metadata")
+    pattern = builder.build(metadata if isinstance(metadata, dict) else None)
+    return expand_motifs(pattern, data.get("motifs"), data.get("structure"))
+
+def resolve_instrument(layer: str, instrument: str = "auto") -> Tuple[int, str]:
+    """Resolve an instrument argument to (GM program, name); name is "default" for layer defaults.
+    
+    Raises:
+        ValueError: If the instrument is not found
+    """
     if instrument == "auto":
-        instrument_program = get_default_instrument_for_layer(layer)
-        instrument_name = "default"
-    else:
-        try:
-            instrument_program = get_instrument_program(instrument)
-            instrument_name = instrument
-        except ValueError as e:
-            print(f"❌ {e}")
-            return
+        return get_default_instrument_for_layer(layer), "default"
+    return get_instrument_program(instrument), instrument
+
+def run_layer(layer: str, key: str, bpm: int, bars: int, instrument: str = "auto", render_audio_flag: bool = True, genre: str = "general", stream: bool = False, pattern_format: str = "json",
+              section_bars: Optional[int] = None, on_audio: Optional[Callable[[bytes], None]] = None, audio_format: str = "wav",
+              wait_for_encoding: bool = True) -> Optional[dict]:
+    """Run a single-layer AI generation (melody, drums, etc.).
+    
+    With `stream`, events are validated as the model produces them and the synth warms up meanwhile.
+    `pattern_format` "compact" asks the model for CSV rows and motif repeats instead of JSON, which
+    takes far fewer output tokens on long patterns. With `section_bars`, patterns longer than that
+    are generated as concurrent sections and stitched together (streaming doesn't apply then).
+    `on_audio` receives the audio as a progressive WAV stream while it renders. A compressed
+    `audio_format` ("flac", "ogg", "opus") is encoded on a background thread while the package is
+    finished off; with `wait_for_encoding` False the result carries that pending encode as "encoding"
+    (a Future of the final audio path) instead of waiting for it.
+    Returns a dict describing the generated package, or None if the instrument could not be resolved.
+    """
     
-    prompt = build_prompt(layer, key, bpm, bars, instrument_name if instrument_name != "default" else "piano", genre)
+    # Resolve instrument
+    try:
+        instrument_program, instrument_name = resolve_instrument(layer, instrument)
+    except ValueError as e:
+        print(f"❌ {e}")
+        return
+    
+    prompt_instrument = instrument_name if instrument_name != "default" else "piano"
+    prompt = build_messages(layer, key, bpm, bars, prompt_instrument, genre, pattern_format)
     print(f"🧠 Generating {layer} layer with GPT-5-mini…")
     if instrument_name != "default":
         print(f"🎵 Using instrument: {instrument_name} (GM Program {instrument_program})")
     
-    ai_data = generate_pattern(prompt, layer=layer, key=key, bpm=bpm, bars=bars)
-    pattern = validate_pattern(ai_data)
+    if section_bars and bars > section_bars:
+        pattern = generate_sectioned_pattern(layer, key, bpm, bars, section_bars, prompt_instrument, genre, pattern_format)
+    elif stream:
+        pattern = stream_validated_pattern(prompt, layer, key, bpm, bars, warm_synth=render_audio_flag, pattern_format=pattern_format)
+    else:
+        ai_data = generate_pattern(prompt, layer=layer, key=key, bpm=bpm, bars=bars, pattern_format=pattern_format)
+        pattern = validate_pattern(ai_data)
 
     # session folder with creative naming
     creative_name = generate_creative_name()
@@ -54,15 +110,45 @@ def run_layer(layer: str, key: str, bpm: int, bars: int, instrument: str = "auto
     outdir.mkdir(parents=True, exist_ok=True)
 
     # save pattern
-    json.dump(pattern, open(outdir / "pattern.json", "w"), indent=2)
+    json.dump(pattern.to_dict(), open(outdir / "pattern.json", "w"), indent=2)
+    
+    # Build the event timeline once; the MIDI file and the audio are both produced from it
+    timeline = build_timeline(pattern, layer, instrument_program, bpm)
     midi_path = outdir / f"{layer}.mid"
-    build_midi(pattern["pattern"], midi_path, layer, instrument_program)
+    
+    with ThreadPoolExecutor(max_workers=1) as midi_writer:
+        # Write the MIDI file in the background while the audio renders
+        midi_future = midi_writer.submit(write_midi, timeline, midi_path)
+        
+        # render audio if requested
+        wav_path = None
+        encoding = None
+        if render_audio_flag:
+            from generation.audio_renderer import render_audio
+            from generation.encoder import encode_in_background, format_sample_rate
+            wav_path = render_audio(timeline, outdir, layer, instrument_program, on_chunk=on_audio,
+                                    sample_rate=format_sample_rate(audio_format))
+            if wav_path and audio_format != "wav":
+                encoding = encode_in_background(wav_path, audio_format)
+        
+        midi_future.result()
     print(f"✅ Saved {layer} MIDI to {midi_path}")
     
-    # render audio if requested
     if render_audio_flag:
-        wav_path = render_audio(midi_path, outdir, layer, instrument_program)
         if wav_path:
             print(f"🎶 Audio rendering complete!")
         else:
-            print(f"⚠️  Audio rendering failed, MIDI file still available")
\ No newline at end of file
+            print(f"⚠️  Audio rendering failed, MIDI file still available")
+    
+    result = {
+        "output_path": str(outdir),
+        "pattern_file": str(outdir / "pattern.json"),
+        "midi_file": str(midi_path),
+        "audio_file": str(wav_path) if wav_path else None,
+    }
+    if encoding and not wait_for_encoding:
+        result["audio_file"] = None
+        result["encoding"] = encoding
+    elif encoding:
+        result["audio_file"] = str(encoding.result())
+    return result
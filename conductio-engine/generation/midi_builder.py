@@ -1,24 +1,150 @@
-from mido import MidiFile, MidiTrack, Message
+import numpy as np
+from mido import MidiFile, MidiTrack, Message, MetaMessage, bpm2tempo
+from ai.pattern_parser import DEFAULT_TIME_SIGNATURE, Pattern, TICKS_PER_BEAT
 
-def build_midi(pattern, output_path, layer_type="melody", instrument_program=0):
-    """Convert pattern list into a basic single-track MIDI file."""
-    mid = MidiFile(type=1, ticks_per_beat=480)
-    track = MidiTrack()
+# One row per note, in absolute ticks
+NOTE_DTYPE = np.dtype([
+    ("start", np.int64),
+    ("end", np.int64),
+    ("note", np.uint8),
+    ("velocity", np.uint8),
+])
+
+# One row per MIDI event, in absolute ticks
+EVENT_DTYPE = np.dtype([
+    ("tick", np.int64),
+    ("note_on", np.bool_),
+    ("channel", np.uint8),
+    ("note", np.uint8),
+    ("velocity", np.uint8),
+])
+
+class Timeline:
+    """In-memory note timeline for one layer, shared by the MIDI writer and the audio renderer."""
+
+    def __init__(self, notes: np.ndarray, layer_type: str = "melody", program: int = 0, bpm: int = 120,
+                 ticks_per_beat: int = TICKS_PER_BEAT, time_signature=DEFAULT_TIME_SIGNATURE):
+        self.notes = notes
+        self.layer_type = layer_type
+        self.program = program
+        self.bpm = bpm
+        self.ticks_per_beat = ticks_per_beat
+        self.time_signature = time_signature
+        self.channel = 9 if layer_type == "drums" else 0
+        self.events = self._build_events()
+
+    def __len__(self) -> int:
+        return len(self.notes)
+
+    @property
+    def seconds_per_tick(self) -> float:
+        return 60.0 / (self.bpm * self.ticks_per_beat)
+
+    def end_seconds(self) -> float:
+        """Time at which the last note ends."""
+        if len(self.notes) == 0:
+            return 0.0
+        return float(self.notes["end"].max()) * self.seconds_per_tick
+
+    def _build_events(self) -> np.ndarray:
+        """Expand notes into time-ordered note_on/note_off events."""
+        count = len(self.notes)
+        events = np.empty(count * 2, dtype=EVENT_DTYPE)
+        events["tick"][0::2] = self.notes["start"]
+        events["tick"][1::2] = self.notes["end"]
+        events["note_on"][0::2] = True
+        events["note_on"][1::2] = False
+        events["channel"] = self.channel
+        events["note"][0::2] = self.notes["note"]
+        events["note"][1::2] = self.notes["note"]
+        events["velocity"][0::2] = self.notes["velocity"]
+        events["velocity"][1::2] = 64
+
+        # Order by tick, with note_off ahead of note_on at the same tick so re-struck notes aren't cut
+        return events[np.lexsort((events["note_on"], events["tick"]))]
+
+def build_timeline(pattern, layer_type="melody", instrument_program=0, bpm=120) -> Timeline:
+    """Convert a validated Pattern (or a list of event dicts) into a Timeline without touching disk.
     
-    # Set appropriate channel for the layer type
-    channel = 9 if layer_type == "drums" else 0
+    Notes start at the absolute tick given by their bar/beat, so chords and overlapping voices keep
+    their timing. When the same pitch is re-struck while still sounding, the earlier note is cut at
+    the new onset, since MIDI can't hold two instances of one pitch on a channel.
+    """
+    if not isinstance(pattern, Pattern):
+        pattern = Pattern.from_events(pattern)
+
+    starts = pattern.ticks.astype(np.int64)
+    ends = starts + pattern.durations
+    pitches = pattern.notes
+
+    # Sort by pitch then onset, and trim each note that overlaps the next one of the same pitch
+    order = np.lexsort((starts, pitches))
+    starts, ends, pitches = starts[order], ends[order], pitches[order]
+    velocities = pattern.velocities[order]
+    if len(starts) > 1:
+        same_pitch = pitches[1:] == pitches[:-1]
+        ends[:-1] = np.where(same_pitch & (ends[:-1] > starts[1:]), starts[1:], ends[:-1])
+
+    # Drop notes trimmed to nothing (duplicate onsets) and restore onset order
+    keep = ends > starts
+    starts, ends, pitches, velocities = starts[keep], ends[keep], pitches[keep], velocities[keep]
+    order = np.argsort(starts, kind="stable")
+
+    notes = np.empty(len(order), dtype=NOTE_DTYPE)
+    notes["start"] = starts[order]
+    notes["end"] = ends[order]
+    notes["note"] = pitches[order]
+    notes["velocity"] = velocities[order]
+
+    return Timeline(notes, layer_type, instrument_program, bpm, time_signature=pattern.time_signature)
+
+def assign_channels(timelines) -> list:
+    """Give each layer its own MIDI channel: drums on 9, other layers on 0-15 skipping 9."""
+    melodic_channels = iter(c for c in range(16) if c != 9)
+    return [9 if timeline.layer_type == "drums" else next(melodic_channels) for timeline in timelines]
+
+def _conductor_messages(timeline: Timeline) -> list:
+    numerator, denominator = timeline.time_signature
+    return [
+        MetaMessage("set_tempo", tempo=bpm2tempo(timeline.bpm), time=0),
+        MetaMessage("time_signature", numerator=numerator, denominator=denominator, time=0),
+    ]
+
+def _note_messages(timeline: Timeline, channel: int) -> list:
+    messages = []
     
     # Add a program change (except for drums)
-    if layer_type != "drums":
-        track.append(Message("program_change", program=instrument_program, time=0, channel=channel))
+    if timeline.layer_type != "drums":
+        messages.append(Message("program_change", program=timeline.program, time=0, channel=channel))
+
+    # Convert absolute ticks into delta times
+    last_tick = 0
+    for tick, note_on, _, note, velocity in timeline.events.tolist():
+        message_type = "note_on" if note_on else "note_off"
+        messages.append(Message(message_type, note=note, velocity=velocity, time=tick - last_tick, channel=channel))
+        last_tick = tick
+    return messages
+
+def write_midi(timeline: Timeline, output_path):
+    """Write a Timeline as a single-track MIDI file."""
+    mid = MidiFile(type=1, ticks_per_beat=timeline.ticks_per_beat)
+    track = MidiTrack(_conductor_messages(timeline))
+    track.extend(_note_messages(timeline, timeline.channel))
+    mid.tracks.append(track)
+    mid.save(output_path)
+
+def write_arrangement_midi(timelines, output_path):
+    """Write several layer timelines as one multi-track MIDI file, one track and channel per layer."""
+    mid = MidiFile(type=1, ticks_per_beat=timelines[0].ticks_per_beat)
+    mid.tracks.append(MidiTrack(_conductor_messages(timelines[0])))
     
-    # Calculate timing for events
-    for event in pattern:
-        note_on = Message("note_on", note=event["note"], velocity=event["velocity"], time=0, channel=channel)
-        note_off = Message("note_off", note=event["note"], velocity=64, time=event["duration"], channel=channel)
-        
-        track.append(note_on)
-        track.append(note_off)
+    for timeline, channel in zip(timelines, assign_channels(timelines)):
+        track = MidiTrack([MetaMessage("track_name", name=timeline.layer_type, time=0)])
+        track.extend(_note_messages(timeline, channel))
+        mid.tracks.append(track)
     
-    mid.tracks.append(track)
-    mid.save(output_path)
\ No newline at end of file
+    mid.save(output_path)
+
+def build_midi(pattern, output_path, layer_type="melody", instrument_program=0, bpm=120):
+    """Convert pattern list into a basic single-track MIDI file."""
+    write_midi(build_timeline(pattern, layer_type, instrument_program, bpm), output_path)
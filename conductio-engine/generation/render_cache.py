@@ -0,0 +1,100 @@
+import hashlib
+import os
+import shutil
+from pathlib import Path
+from typing import List, Optional, Union
+
+import numpy as np
+
+from ai.cache import DiskCache, cache_settings, temp_path
+from generation.midi_builder import Timeline
+
+class RenderCache(DiskCache):
+    """Persistent, content-addressed cache of rendered WAV files.
+
+    Entries are named by a hash of everything that determines the audio: the timeline's events and
+    tempo, the instrument program, layer type, sample rate, synthesis backend and renderer version.
+    Once the cache grows past `max_bytes` the least recently used entries are evicted. Hits are
+    hard-linked into place when the cache and the output share a filesystem, and copied otherwise.
+    """
+
+    suffix = ".wav"
+
+    def __init__(self, directory: str = ".cache/renders", max_bytes: int = 1024 * 1024 * 1024, enabled: bool = True):
+        super().__init__(directory, max_bytes, enabled)
+
+    @staticmethod
+    def make_key(timeline: Union[Timeline, List[Timeline]], sample_rate: int, backend: str, renderer_version: str) -> str:
+        """Hash a render request (one timeline, or several rendered as a mix) into a stable cache key."""
+        digest = hashlib.sha256()
+        for timeline in ([timeline] if isinstance(timeline, Timeline) else timeline):
+            # Events in a canonical order, so the same notes listed differently hash the same
+            events = timeline.events
+            events = events[np.lexsort((events["velocity"], events["note"], events["note_on"], events["tick"]))]
+            digest.update(repr((renderer_version, backend, sample_rate, timeline.layer_type, timeline.program,
+                                timeline.bpm, timeline.ticks_per_beat)).encode("utf-8"))
+            digest.update(events.tobytes())
+        return digest.hexdigest()
+
+    def _touch(self, path: Path):
+        # An entry shares its inode with the package WAVs linked from it, so touching its mtime would
+        # change theirs too. Re-applying its mode bumps only the ctime, which eviction goes by instead
+        os.chmod(path, path.stat().st_mode)
+
+    @staticmethod
+    def _last_used(stat: os.stat_result) -> float:
+        return stat.st_ctime
+
+    @staticmethod
+    def _place(source: Path, destination: Path):
+        # Write under a temporary name first so nobody sees a half-copied file
+        tmp_path = temp_path(destination)
+        try:
+            try:
+                tmp_path.unlink()
+                os.link(source, tmp_path)
+            except OSError:
+                shutil.copyfile(source, tmp_path)
+            os.replace(tmp_path, destination)
+            # rename() is a no-op when both names already link the same file, leaving the temporary name behind
+            tmp_path.unlink(missing_ok=True)
+        except BaseException:
+            tmp_path.unlink(missing_ok=True)
+            raise
+
+    def fetch(self, key: str, destination: Path) -> bool:
+        """Place the cached render for `key` at `destination`. Returns False on a miss."""
+        if not self.enabled:
+            return False
+        path = self._path(key)
+        if not path.exists():
+            return False
+        try:
+            self._place(path, destination)
+            self._touch(path)
+        except OSError:
+            return False
+        return True
+
+    def store(self, key: str, source: Path):
+        """Add a freshly rendered file to the cache and evict old entries if it is over its size limit."""
+        if not self.enabled:
+            return
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            self._place(source, path)
+        except OSError as e:
+            print(f"⚠️  Could not cache render ({e})")
+            return
+
+        self._evict()
+
+_render_cache: Optional[RenderCache] = None
+
+def get_render_cache() -> RenderCache:
+    """Return the process-wide render cache, configured from CONDUCTIO_RENDER_CACHE_* environment variables."""
+    global _render_cache
+    if _render_cache is None:
+        _render_cache = RenderCache(**cache_settings("CONDUCTIO_RENDER_CACHE", ".cache/renders", 1024))
+    return _render_cache
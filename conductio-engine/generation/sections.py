@@ -0,0 +1,49 @@
+from typing import List, Tuple
+import numpy as np
+
+from ai.prompt_builder import build_messages, build_section_context
+from ai.client import generate_pattern, generate_patterns
+from ai.pattern_parser import Pattern, stitch_sections, validate_pattern
+
+# How many of the opening section's last notes are shown to the later sections
+SEED_NOTES = 8
+
+def split_sections(bars: int, section_bars: int) -> List[Tuple[int, int]]:
+    """Split a piece into (start_bar, bars) sections of at most `section_bars` bars."""
+    section_bars = max(1, section_bars)
+    return [(start, min(section_bars, bars - start + 1)) for start in range(1, bars + 1, section_bars)]
+
+def seed_rows(pattern: Pattern, count: int = SEED_NOTES) -> str:
+    """The pattern's last `count` notes as compact note,velocity,duration,bar,beat rows."""
+    order = np.argsort(pattern.ticks, kind="stable")[-count:]
+    return "\n".join(
+        f"{note},{velocity},{duration},{bar},{beat:g}"
+        for note, velocity, duration, bar, beat, _ in pattern.events[order].tolist()
+    )
+
+def generate_sectioned_pattern(layer: str, key: str, bpm: int, bars: int, section_bars: int, instrument: str = "piano",
+                               genre: str = "general", pattern_format: str = "json") -> Pattern:
+    """Generate a long pattern as several shorter sections and stitch them together.
+    
+    The opening section is generated first so its closing notes can seed the rest; the remaining
+    sections are then requested concurrently, so latency tracks two sections rather than the whole piece.
+    """
+    sections = split_sections(bars, section_bars)
+    
+    def request(index: int, seed: str = "") -> dict:
+        start_bar, length = sections[index]
+        context = build_section_context(index, len(sections), start_bar, length, bars, seed)
+        prompt = build_messages(layer, key, bpm, length, instrument, genre, pattern_format, context)
+        return {"prompt": prompt, "format": pattern_format, "layer": layer, "key": key, "bpm": bpm, "bars": length}
+    
+    print(f"🧩 Generating {bars} bars as {len(sections)} sections of up to {section_bars} bars…")
+    opening = request(0)
+    patterns = [validate_pattern(generate_pattern(opening["prompt"], layer=layer, key=key, bpm=bpm, bars=opening["bars"],
+                                                  pattern_format=pattern_format))]
+    if len(sections) > 1:
+        seed = seed_rows(stitch_sections(patterns[:1], sections[:1]))
+        rest = generate_patterns([request(index, seed) for index in range(1, len(sections))])
+        patterns.extend(validate_pattern(ai_data) for ai_data in rest)
+    
+    metadata = {**patterns[0].metadata, "bars": bars, "section_bars": section_bars}
+    return stitch_sections(patterns, sections, metadata)
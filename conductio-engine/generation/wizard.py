@@ -1,6 +1,5 @@
 import os
 from typing import Dict, List, Tuple
-from generation.layer_runner import run_layer
 from generation.instruments import list_instruments_by_category, get_instrument_program
 
 def run_wizard():
@@ -34,6 +33,7 @@ def run_wizard():
         
         if confirm_generation():
             print("\n🚀 Starting generation...")
+            from generation.layer_runner import run_layer
             run_layer(layer=layer, key=key, bpm=bpm, bars=bars, 
                      instrument=instrument, render_audio_flag=render_audio, genre=genre)
         else:
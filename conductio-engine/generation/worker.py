@@ -0,0 +1,226 @@
+import base64
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import redirect_stdout
+from typing import Callable, Optional, TextIO
+
+from ai.client import get_client
+from ai.pattern_parser import PATTERN_FORMATS
+from generation.audio_renderer import get_renderer
+from generation.instruments import get_instrument_program
+from generation.layer_runner import run_layer
+from generation.arrangement import parse_arrangement, run_arrangement
+from generation.encoder import AUDIO_FORMATS, wait_for_encodes
+
+# Responses may be written from more than one thread, so every line goes out under this lock
+_write_lock = threading.Lock()
+
+def send_message(stream: TextIO, message: dict):
+    """Write one JSON message as a single line and flush it immediately."""
+    with _write_lock:
+        stream.write(json.dumps(message) + "\n")
+        stream.flush()
+
+def warm_up():
+    """Load everything a job needs up front: heavy imports, the OpenAI client and the soundfont."""
+    api_key = os.getenv("OPENAI_API_KEY")
+    if api_key:
+        get_client(api_key)
+
+    try:
+        if get_renderer().warm_up():
+            print("🎵 FluidR3 soundfont loaded and resident")
+        else:
+            print("⚠️  FluidR3 soundfont not found, renders will use basic synthesis")
+    except Exception as e:
+        print(f"⚠️  Could not warm up FluidSynth ({e}), renders will load it on demand")
+
+def audio_sender(job_id, emit: Callable[[dict], None]) -> Callable[[bytes], None]:
+    """Callback that forwards progressive WAV chunks as numbered "audio" events for job `job_id`."""
+    sequence = 0
+
+    def send(chunk: bytes):
+        nonlocal sequence
+        message = {"id": job_id, "event": "audio", "seq": sequence, "data": base64.b64encode(chunk).decode("ascii")}
+        if sequence == 0:
+            message["mimeType"] = "audio/wav"
+        emit(message)
+        sequence += 1
+    return send
+
+def check_audio_format(job: dict) -> Optional[str]:
+    """Error message if the job asks for an audio format the engine can't write."""
+    audio_format = job.get("audioFormat", "wav")
+    if audio_format not in AUDIO_FORMATS:
+        return f"Audio format must be one of: {', '.join(AUDIO_FORMATS)}"
+    return None
+
+def handle_job(job: dict, emit: Optional[Callable[[dict], None]] = None) -> Optional[dict]:
+    """Run a single generation job and return its JSON-serializable result.
+
+    With "streamAudio" in the job and an `emit` callback, audio chunks are emitted while rendering.
+    With `emit`, a compressed "audioFormat" is encoded in the background: this emits a "rendered"
+    event, returns None and emits the result once encoding finishes, so the next job can start in
+    the meantime.
+    """
+    job_id = job.get("id")
+    layer = job.get("layer")
+    if layer not in ["melody", "bass", "drums", "chords"]:
+        return {"id": job_id, "success": False, "error": "Layer must be one of: melody, bass, drums, chords"}
+
+    pattern_format = job.get("format", "json")
+    if pattern_format not in PATTERN_FORMATS:
+        return {"id": job_id, "success": False, "error": f"Format must be one of: {', '.join(PATTERN_FORMATS)}"}
+
+    format_error = check_audio_format(job)
+    if format_error:
+        return {"id": job_id, "success": False, "error": format_error}
+
+    instrument = job.get("instrument") or "auto"
+    if instrument != "auto":
+        try:
+            get_instrument_program(str(instrument))
+        except ValueError as e:
+            return {"id": job_id, "success": False, "error": str(e)}
+
+    started = time.perf_counter()
+    result = run_layer(
+        layer=layer,
+        key=job.get("key", "C minor"),
+        bpm=int(job.get("bpm", 120)),
+        bars=int(job.get("bars", 8)),
+        instrument=str(instrument),
+        render_audio_flag=job.get("renderAudio", True) is not False,
+        genre=job.get("genre", "general"),
+        stream=bool(job.get("stream", False)),
+        pattern_format=pattern_format,
+        section_bars=int(job["sectionBars"]) if job.get("sectionBars") else None,
+        on_audio=audio_sender(job_id, emit) if emit and job.get("streamAudio") else None,
+        audio_format=job.get("audioFormat", "wav"),
+        wait_for_encoding=emit is None,
+    )
+    if result is None:
+        return {"id": job_id, "success": False, "error": "Generation failed"}
+
+    response = {
+        "id": job_id,
+        "success": True,
+        "outputPath": result["output_path"],
+        "patternFile": result["pattern_file"],
+        "midiFile": result["midi_file"],
+        "audioFile": result["audio_file"],
+        "elapsed": round(time.perf_counter() - started, 3),
+    }
+    encoding = result.get("encoding")
+    if encoding is None:
+        return response
+
+    # Tells the caller this worker is free for the next job while the encode finishes
+    emit({"id": job_id, "event": "rendered"})
+    def reply(done):
+        audio_file = None if done.exception() else done.result()
+        response["audioFile"] = str(audio_file) if audio_file else None
+        response["elapsed"] = round(time.perf_counter() - started, 3)
+        emit(response)
+    encoding.add_done_callback(reply)
+    return None
+
+def handle_arrangement_job(job: dict) -> dict:
+    """Run an arrangement job ("layers": "melody,bass:fretless_bass,drums") and return its result."""
+    job_id = job.get("id")
+    try:
+        layers = parse_arrangement(str(job.get("layers", "")))
+    except ValueError as e:
+        return {"id": job_id, "success": False, "error": str(e)}
+
+    pattern_format = job.get("format", "json")
+    if pattern_format not in PATTERN_FORMATS:
+        return {"id": job_id, "success": False, "error": f"Format must be one of: {', '.join(PATTERN_FORMATS)}"}
+    format_error = check_audio_format(job)
+    if format_error:
+        return {"id": job_id, "success": False, "error": format_error}
+
+    started = time.perf_counter()
+    result = run_arrangement(
+        layers,
+        key=job.get("key", "C minor"),
+        bpm=int(job.get("bpm", 120)),
+        bars=int(job.get("bars", 8)),
+        render_audio_flag=job.get("renderAudio", True) is not False,
+        genre=job.get("genre", "general"),
+        pattern_format=pattern_format,
+        stems=job.get("stems", False) is True,
+        audio_format=job.get("audioFormat", "wav"),
+    )
+    if result is None:
+        return {"id": job_id, "success": False, "error": "Arrangement failed"}
+
+    return {
+        "id": job_id,
+        "success": True,
+        "outputPath": result["output_path"],
+        "patternFile": result["pattern_file"],
+        "midiFile": result["midi_file"],
+        "mix": result["mix"],
+        "stems": result["stems"],
+        "elapsed": round(time.perf_counter() - started, 3),
+    }
+
+def serve(stdin: Optional[TextIO] = None, stdout: Optional[TextIO] = None):
+    """Serve newline-delimited JSON jobs until stdin closes or a shutdown job arrives.
+
+    Each request line is a JSON object with an "id" and the generation parameters
+    (layer, key, bpm, bars, instrument, genre, renderAudio, stream, format,
+    sectionBars, streamAudio, audioFormat), or "op": "arrange" with
+    a "layers" spec such as "melody,bass,drums" (and optionally "stems": true) instead of a single layer. Each reply
+    is one JSON line carrying the same "id"; with "streamAudio", it is preceded by "audio" events
+    whose base64 "data" chunks concatenate into a playable WAV stream. Progress output from the engine goes to
+    stderr so stdout only ever carries protocol messages. Jobs with a compressed "audioFormat" get a
+    "rendered" event once rendering is done and their reply when the background encode finishes,
+    so replies may arrive out of order and the next job can be sent as soon as "rendered" arrives.
+    """
+    stdin = stdin or sys.stdin
+    stdout = stdout or sys.stdout
+
+    # Progress output goes to stderr for the whole session: background encodes print between jobs too
+    with redirect_stdout(sys.stderr):
+        warm_up()
+        send_message(stdout, {"event": "ready", "pid": os.getpid()})
+
+        def emit(message: dict):
+            send_message(stdout, message)
+
+        for line in stdin:
+            line = line.strip()
+            if not line:
+                continue
+
+            try:
+                job = json.loads(line)
+            except json.JSONDecodeError as e:
+                send_message(stdout, {"id": None, "success": False, "error": f"Invalid JSON request: {e}"})
+                continue
+
+            op = job.get("op", "generate")
+            if op == "ping":
+                send_message(stdout, {"id": job.get("id"), "success": True, "event": "pong"})
+                continue
+            if op == "shutdown":
+                wait_for_encodes()
+                send_message(stdout, {"id": job.get("id"), "success": True, "event": "shutdown"})
+                break
+
+            try:
+                response = handle_arrangement_job(job) if op == "arrange" else handle_job(job, emit)
+            except Exception as e:
+                print(f"❌ Job {job.get('id')} failed: {e}")
+                response = {"id": job.get("id"), "success": False, "error": str(e)}
+            # None means the reply is sent once the job's background encode finishes
+            if response is not None:
+                send_message(stdout, response)
+
+        # Replies for encodes still in flight go out before the worker exits
+        wait_for_encodes()
@@ -1,11 +1,15 @@
 import argparse
+import os
 import sys
-from generation.layer_runner import run_layer
-from generation.wizard import run_wizard
+from ai.formats import PATTERN_FORMATS
+
+# Only argparse and the constants above load at startup; each command imports what it needs, so
+# light commands like --list-instruments never pay for numpy, openai or the audio stack
 
 if __name__ == "__main__":
     # Check if running in wizard mode
     if len(sys.argv) == 1 or (len(sys.argv) == 2 and sys.argv[1] in ["--wizard", "-w"]):
+        from generation.wizard import run_wizard
         run_wizard()
         sys.exit(0)
     
@@ -17,14 +21,32 @@ if __name__ == "__main__":
     parser.add_argument("--instrument", default="auto", help="GM instrument name or number (e.g., 'electric_guitar', 'violin', '25')")
     parser.add_argument("--genre", default="general", help="Musical genre (rock, jazz, classical, electronic, blues, folk, latin, country)")
     parser.add_argument("--no-audio", action="store_true", help="Skip audio rendering (MIDI only)")
+    parser.add_argument("--render-segments", type=float, metavar="SECONDS", help="Split long audio renders into segments of this many seconds rendered in parallel processes")
+    parser.add_argument("--audio-format", default="wav", help="Audio output format: 'wav' (default), 'flac', 'ogg' (Vorbis) or 'opus'")
+    parser.add_argument("--render-backend", help="Audio render backend: 'stream' (default) or 'samples' (each distinct note rendered once, much faster for drums)")
+    parser.add_argument("--format", default="json", choices=PATTERN_FORMATS, dest="pattern_format", help="Pattern format requested from the model; 'compact' uses far fewer tokens on long patterns")
+    parser.add_argument("--section-bars", type=int, help="Generate long patterns as concurrent sections of this many bars (e.g. 8)")
+    parser.add_argument("--stream", action="store_true", help="Stream the model response and validate notes as they arrive")
     parser.add_argument("--wizard", "-w", action="store_true", help="Run interactive wizard")
+    parser.add_argument("--prompt-info", action="store_true", help="Show the prompt's version, static prefix hash and token counts, then exit")
     parser.add_argument("--list-instruments", action="store_true", help="List all available instruments")
+    parser.add_argument("--export-catalog", nargs="?", const="", metavar="PATH", help="Write the instrument catalog JSON (default .cache/instrument_catalog.json) if instruments.py has changed")
+    parser.add_argument("--force", action="store_true", help="With --export-catalog, rewrite the catalog even if it is up to date")
+    parser.add_argument("--arrange", metavar="LAYERS", help="Generate several layers as one arrangement, e.g. 'melody:violin,bass,drums,chords'")
+    parser.add_argument("--stems", action="store_true", help="With --arrange, also render each layer to its own WAV next to the mix")
+    parser.add_argument("--serve", action="store_true", help="Run as a warm worker taking JSON-lines jobs on stdin")
     args = parser.parse_args()
     
     if args.wizard:
+        from generation.wizard import run_wizard
         run_wizard()
         sys.exit(0)
     
+    if args.serve:
+        from generation.worker import serve
+        serve()
+        sys.exit(0)
+    
     if args.list_instruments:
         from generation.instruments import list_instruments_by_category
         print("🎼 Available Instruments by Category:")
@@ -41,11 +63,61 @@ if __name__ == "__main__":
         print("💡 Use instrument names in lowercase with underscores (e.g., 'electric_guitar')")
         sys.exit(0)
     
+    if args.export_catalog is not None:
+        from generation.catalog import DEFAULT_CATALOG_PATH, export_catalog
+        path = args.export_catalog or DEFAULT_CATALOG_PATH
+        if export_catalog(path, force=args.force):
+            print(f"📇 Wrote instrument catalog to {path}")
+        else:
+            print(f"📇 Instrument catalog at {path} is up to date")
+        sys.exit(0)
+    
+    if args.prompt_info:
+        from ai.prompt_builder import build_messages, prompt_info
+        instrument = args.instrument if args.instrument != "auto" else "piano"
+        info = prompt_info(build_messages(args.layer or "melody", args.key, args.bpm, args.bars, instrument, args.genre, args.pattern_format))
+        print(f"🧾 Prompt v{info['version']} ({args.pattern_format} format)")
+        print(f"   Static prefix: {info['prefix_hash']} ({info['prefix_tokens']} tokens)")
+        print(f"   Total: {info['total_tokens']} tokens")
+        sys.exit(0)
+    
+    if args.render_segments is not None:
+        # Set through the environment, like the render backend below
+        os.environ["CONDUCTIO_RENDER_SEGMENT_SECONDS"] = str(args.render_segments)
+    
+    if args.render_backend:
+        # Set through the environment so arrangement render processes use it too
+        os.environ["CONDUCTIO_RENDER_BACKEND"] = args.render_backend
+        from generation.audio_renderer import RENDER_BACKENDS
+        if args.render_backend not in RENDER_BACKENDS:
+            print(f"❌ Error: --render-backend must be one of: {', '.join(RENDER_BACKENDS)}")
+            sys.exit(1)
+    
+    if args.audio_format != "wav":
+        from generation.encoder import AUDIO_FORMATS
+        if args.audio_format not in AUDIO_FORMATS:
+            print(f"❌ Error: --audio-format must be one of: {', '.join(AUDIO_FORMATS)}")
+            sys.exit(1)
+    
+    if args.arrange:
+        from generation.arrangement import parse_arrangement, run_arrangement
+        try:
+            layers = parse_arrangement(args.arrange)
+        except ValueError as e:
+            print(f"❌ Error: {e}")
+            sys.exit(1)
+        result = run_arrangement(layers, key=args.key, bpm=args.bpm, bars=args.bars,
+                                 render_audio_flag=not args.no_audio, genre=args.genre, pattern_format=args.pattern_format, stems=args.stems,
+                                 audio_format=args.audio_format)
+        sys.exit(0 if result else 1)
+    
     if not args.layer:
         print("❌ Error: --layer is required when not using wizard mode")
         print("💡 Try: python main.py --wizard")
         sys.exit(1)
     
+    from generation.layer_runner import run_layer
     render_audio = not args.no_audio
     run_layer(layer=args.layer, key=args.key, bpm=args.bpm, bars=args.bars, 
-              instrument=args.instrument, render_audio_flag=render_audio, genre=args.genre)
\ No newline at end of file
+              instrument=args.instrument, render_audio_flag=render_audio, genre=args.genre, stream=args.stream,
+              pattern_format=args.pattern_format, section_bars=args.section_bars, audio_format=args.audio_format)
\ No newline at end of file